@@ -1,18 +1,26 @@
 import datetime
-from typing import Union
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Tuple, Union
 from typing_extensions import Annotated
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from sql_interface import crud, schemas
-from sql_interface.database import get_db
+from sql_interface import crud, crud_async
+from sql_interface.database import get_async_db, get_db
 from auth.jwt import encode_access_token, decode_access_token
 
 
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7 # 1 week
 
+CURRENT_USER_CACHE_TTL_SECS = 60
+CURRENT_USER_CACHE_MAX_ENTRIES = 1024
+
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth")
 
@@ -28,7 +36,9 @@ async def get_token(
     ],
     db: Session = Depends(get_db),
 ):
-    user = crud.get_user(
+    # run blocking DB access off the event loop
+    user = await run_in_threadpool(
+        crud.get_user,
         db,
         id=form_data.username,
         password=form_data.password
@@ -49,10 +59,59 @@ async def get_token(
     }
 
 
+# authenticated user resolved from the token
+# (holds no ORM relationships, so no bookmarks are loaded)
+@dataclass
+class CurrentUser:
+    id: str
+    display_name: str
+    created_at: datetime.datetime
+    updated_at: datetime.datetime
+
+
+# in-process cache of resolved users keyed by (user id, token)
+class CurrentUserCache:
+    ttl_secs: float
+    max_entries: int
+    entries: Dict[Tuple[str, str], Tuple[CurrentUser, float]]
+
+    def __init__(self, ttl_secs: float, max_entries: int) -> None:
+        self.ttl_secs = ttl_secs
+        self.max_entries = max_entries
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def get(self, user_id: str, token: str) -> Union[CurrentUser, None]:
+        with self.lock:
+            entry = self.entries.get((user_id, token))
+            if entry is None:
+                return None
+            user, expires_at = entry
+            if expires_at < time.monotonic():
+                del self.entries[(user_id, token)]
+                return None
+            return user
+
+    def set(self, token: str, user: CurrentUser) -> None:
+        with self.lock:
+            if len(self.entries) >= self.max_entries:
+                self.entries.clear()
+            self.entries[(user.id, token)] = (
+                user,
+                time.monotonic() + self.ttl_secs
+            )
+
+
+current_user_cache = CurrentUserCache(
+    CURRENT_USER_CACHE_TTL_SECS,
+    CURRENT_USER_CACHE_MAX_ENTRIES
+)
+
+
 # intermediate function for auth check
 async def get_current_user(
     token: Annotated[str, Depends(oauth2_scheme)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -64,16 +123,32 @@ async def get_current_user(
         # malformatted token
         raise credentials_exception
     
-    user = crud.get_user(db, id=user_id)
+    current_user = current_user_cache.get(user_id, token)
+    if current_user is not None:
+        return current_user
+
+    user = await crud_async.get_user(db, id=user_id)
     if user is None:
         # user not found
         raise credentials_exception
     
-    return user
+    current_user = CurrentUser(
+        id=user.id,
+        display_name=user.display_name,
+        created_at=user.created_at,
+        updated_at=user.updated_at,
+    )
+    current_user_cache.set(token, current_user)
+
+    # end the read transaction so that the connection goes back to the
+    # pool while the route runs
+    await db.rollback()
+
+    return current_user
 
 
 # add this to route arguments in order to check token
 UserInfo = Annotated[
-    Union[schemas.UserReadDeep, None],
+    CurrentUser,
     Depends(get_current_user)
 ]
@@ -0,0 +1,185 @@
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from typing import Dict, List
+
+import httpx
+from fastapi import Depends, FastAPI, HTTPException, status
+from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from typing_extensions import Annotated
+
+from auth.auth import (
+    UserInfo, auth_router, current_user_cache, get_current_user,
+    oauth2_scheme
+)
+from auth.jwt import decode_access_token, encode_access_token
+from sql_interface import crud, models
+from sql_interface.database import Base, get_async_db, get_db
+
+
+async def legacy_get_token(
+    form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
+    db: Session = Depends(get_db),
+):
+    # implementation before lookups were moved off the event loop
+    user = crud.get_user(
+        db, id=form_data.username, password=form_data.password
+    )
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+    return {"accessToken": encode_access_token(user.id)}
+
+
+async def legacy_get_current_user(
+    token: Annotated[str, Depends(oauth2_scheme)],
+    db: Session = Depends(get_db),
+):
+    # implementation before lookups were moved off the event loop
+    user_id = decode_access_token(token)
+    user = crud.get_user(db, id=user_id) if user_id is not None else None
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+    return user
+
+
+def make_app(
+    db_path: str, latency_secs: float, pool_size: int, legacy: bool
+) -> FastAPI:
+    # every statement takes latency_secs in the thread running it, like
+    # a round trip to a database server would
+    # (pools must cover all requests at once: legacy routes wait for a
+    # connection on the event loop, which never gets one back otherwise)
+    def add_latency(dbapi_connection, connection_record) -> None:
+        def sleep(statement: str) -> None:
+            time.sleep(latency_secs)
+        if hasattr(dbapi_connection, "driver_connection"):
+            # aiosqlite: statements run in a thread of the connection
+            dbapi_connection.await_(
+                dbapi_connection.driver_connection.set_trace_callback(sleep)
+            )
+        else:
+            dbapi_connection.set_trace_callback(sleep)
+
+    engine = create_engine(
+        f"sqlite:///{db_path}",
+        connect_args={"check_same_thread": False},
+        pool_size=pool_size
+    )
+    async_engine = create_async_engine(
+        f"sqlite+aiosqlite:///{db_path}", pool_size=pool_size
+    )
+    event.listen(engine, "connect", add_latency)
+    event.listen(async_engine.sync_engine, "connect", add_latency)
+    session_local = sessionmaker(bind=engine)
+    async_session_local = async_sessionmaker(
+        bind=async_engine, expire_on_commit=False
+    )
+
+    def get_bench_db():
+        db = session_local()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def get_bench_async_db():
+        async with async_session_local() as db:
+            yield db
+
+    app = FastAPI()
+    if legacy:
+        app.post("/auth")(legacy_get_token)
+        app.dependency_overrides[get_current_user] = legacy_get_current_user
+    else:
+        app.include_router(auth_router)
+    app.dependency_overrides[get_db] = get_bench_db
+    app.dependency_overrides[get_async_db] = get_bench_async_db
+
+    @app.get("/me")
+    async def read_me(user_info: UserInfo):
+        return {"id": user_info.id}
+
+    return app
+
+
+async def run_requests(app: FastAPI, n_users: int) -> Dict[str, float]:
+    # seconds taken by n_users logins at once, then by the same number of
+    # authenticated requests at once (with the user cache cold and warm),
+    # and the longest stall of a timer on the event loop meanwhile
+    stalls: List[float] = []
+    done = False
+
+    async def watch_loop() -> None:
+        while not done:
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            stalls.append(time.perf_counter() - start)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        watcher = asyncio.ensure_future(watch_loop())
+        result: Dict[str, float] = {}
+
+        start = time.perf_counter()
+        responses = await asyncio.gather(*[
+            client.post("/auth", data={
+                "username": f"user{i}", "password": "password"
+            }) for i in range(n_users)
+        ])
+        result["login"] = time.perf_counter() - start
+        tokens = [response.json()["accessToken"] for response in responses]
+
+        current_user_cache.entries.clear()
+        for name in ("cold", "warm"):
+            start = time.perf_counter()
+            await asyncio.gather(*[
+                client.get("/me", headers={
+                    "Authorization": f"Bearer {token}"
+                }) for token in tokens
+            ])
+            result[name] = time.perf_counter() - start
+
+        done = True
+        await watcher
+    result["stall"] = max(stalls)
+    return result
+
+
+if __name__ == "__main__":
+    # python -m auth.bench_auth
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-u", "--users", type=int, nargs="+", default=[1, 8, 32])
+    ap.add_argument("-l", "--latency", type=float, default=0.01)
+    args = ap.parse_args()
+
+    os.environ.setdefault("JWT_KEY", "bench")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        engine = create_engine(f"sqlite:///{db_path}")
+        Base.metadata.create_all(engine)
+        with Session(engine) as db:
+            for i in range(max(args.users)):
+                db.add(models.User(
+                    id=f"user{i}", password="password",
+                    display_name=f"user{i}"
+                ))
+            db.commit()
+
+        for n_users in args.users:
+            print(f"{n_users} concurrent users")
+            for legacy in (True, False):
+                app = make_app(db_path, args.latency, n_users, legacy)
+                result = asyncio.run(run_requests(app, n_users))
+                print(f"  {'legacy' if legacy else 'current'}: "
+                      + f"login {result['login']:.3f}s, "
+                      + f"cold {result['cold']:.3f}s, "
+                      + f"warm {result['warm']:.3f}s, "
+                      + f"loop stall {result['stall'] * 1000:.0f}ms")
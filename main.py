@@ -1,3 +1,5 @@
+import os
+
 from fastapi import FastAPI, Request, status
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
@@ -5,8 +7,10 @@ from fastapi.responses import JSONResponse
 
 from auth.auth import auth_router
 from dotenv import load_dotenv
-from routers import users, albums, bookmarks, tags, gamemodes
+from routers import users, albums, bookmarks, tags, gamemodes, stored_files
+from routers.ocr_jobs_worker import OcrJobsWorker
 from routers.temp_albums_cleaner import TempAlbumsCleaner
+from sql_interface.counter_buffer import album_counter_buffer
 
 
 # load .env
@@ -43,11 +47,26 @@ app.include_router(albums.router)
 app.include_router(bookmarks.router)
 app.include_router(tags.router)
 app.include_router(gamemodes.router)
+app.include_router(stored_files.router)
 
 # kick temp_albums cleaner
 temp_albums_cleaner = TempAlbumsCleaner()
 
+ocr_jobs_worker = OcrJobsWorker()
+
+@app.on_event("startup")
+async def startup_event():
+    # kick OCR job workers
+    # (OCR_JOB_WORKERS=0 when workers run apart, see
+    # routers/ocr_jobs_worker.py)
+    ocr_jobs_worker.start(int(os.environ.get("OCR_JOB_WORKERS", "1")))
+    # start periodic flush of buffered pv/download counts
+    album_counter_buffer.start()
+
 @app.on_event("shutdown")
 async def shutdown_event():
     global temp_albums_cleaner
     temp_albums_cleaner.stop()
+    ocr_jobs_worker.stop()
+    # flush buffered pv/download counts
+    album_counter_buffer.stop()
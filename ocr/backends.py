@@ -0,0 +1,266 @@
+import json
+import os
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from io import BytesIO
+from typing import Dict, Iterable, List, Tuple
+
+from PIL import Image
+
+from ocr.image_annotator import (
+    AnnotateBatchDispatcher, ImageAnnotation, Mosaic, MosaicWord,
+    annotate_images, assign_words, build_mosaics, frame_hash,
+    get_annotator_client,
+)
+
+
+OCR_BACKEND_VISION = "vision"
+OCR_BACKEND_TESSERACT = "tesseract"
+OCR_BACKEND_REPLAY = "replay"
+OCR_BACKEND_STUB = "stub"
+
+DEFAULT_TESSERACT_LANG = "jpn"
+TESSERACT_WORKERS = 4
+
+DEFAULT_STUB_LATENCY_SECS = 1.0
+
+# primary calls of FallbackBackend running at once, including those that
+# timed out and are left to finish
+FALLBACK_MAX_PRIMARY_CALLS = 4
+
+
+class OCRBackend:
+    # turns frames into annotations of their subtitle and player regions
+    # (name separates cached results of different backends; results of
+    # backends that are not persistent are never cached)
+    name: str
+    persistent: bool = True
+
+    def annotate_images(
+        self, images: Iterable[Image.Image]
+    ) -> List[ImageAnnotation]:
+        raise NotImplementedError()
+
+    def annotate_images_by(
+        self, images: Iterable[Image.Image]
+    ) -> Tuple[List[ImageAnnotation], "OCRBackend"]:
+        # annotations and the backend that produced them, which results
+        # are cached for (another one than self for FallbackBackend)
+        return self.annotate_images(images), self
+
+
+class VisionBackend(OCRBackend):
+    # Google Vision API, with requests of concurrent callers sent together
+    name = OCR_BACKEND_VISION
+
+    def __init__(self) -> None:
+        self.dispatcher = AnnotateBatchDispatcher(get_annotator_client())
+
+    def annotate_images(
+        self, images: Iterable[Image.Image]
+    ) -> List[ImageAnnotation]:
+        return annotate_images(images, dispatcher=self.dispatcher)
+
+
+class TesseractBackend(OCRBackend):
+    # local OCR with the tesseract command on the same mosaics as sent to
+    # Vision API (requires tesseract and its language data installed)
+    name = OCR_BACKEND_TESSERACT
+
+    def __init__(self, lang: str = DEFAULT_TESSERACT_LANG) -> None:
+        self.lang = lang
+
+    def recognize(self, mosaic: Mosaic) -> List[MosaicWord]:
+        buffer = BytesIO()
+        mosaic.image.save(buffer, "png")
+        completed = subprocess.run(
+            ["tesseract", "stdin", "stdout", "-l", self.lang, "tsv"],
+            input=buffer.getvalue(),
+            capture_output=True,
+            check=True,
+        )
+        return parse_tesseract_tsv(completed.stdout.decode())
+
+    def annotate_images(
+        self, images: Iterable[Image.Image]
+    ) -> List[ImageAnnotation]:
+        mosaics, n_frames = build_mosaics(images)
+        with ThreadPoolExecutor(max_workers=TESSERACT_WORKERS) as executor:
+            words_per_mosaic = list(executor.map(self.recognize, mosaics))
+        return assign_words(mosaics, words_per_mosaic, n_frames)
+
+
+def parse_tesseract_tsv(tsv: str) -> List[MosaicWord]:
+    # columns: level page_num block_num par_num line_num word_num
+    #          left top width height conf text
+    words: List[MosaicWord] = []
+    for line in tsv.splitlines()[1:]:
+        columns = line.split("\t")
+        if len(columns) < 12 or columns[0] != "5":
+            continue
+        text = columns[11].strip()
+        if len(text) == 0:
+            continue
+        left, top, width, height = (int(n) for n in columns[6:10])
+        words.append((text, (left, top, left + width, top + height)))
+    return words
+
+
+class FixtureReplayBackend(OCRBackend):
+    # replays annotations recorded with write_fixture() by frame hash;
+    # frames not in the fixture get empty annotations
+    name = OCR_BACKEND_REPLAY
+    persistent = False
+
+    def __init__(self, fixture_path: str) -> None:
+        with open(fixture_path, encoding="utf-8") as f:
+            self.fixture: Dict[str, Dict[str, str]] = json.load(f)
+
+    def annotate_images(
+        self, images: Iterable[Image.Image]
+    ) -> List[ImageAnnotation]:
+        result: List[ImageAnnotation] = []
+        for image in images:
+            recorded = self.fixture.get(frame_hash(image))
+            if recorded is None:
+                result.append(ImageAnnotation("", ""))
+            else:
+                result.append(ImageAnnotation(
+                    recorded["description"], recorded["playerName"]
+                ))
+        return result
+
+
+def write_fixture(
+    fixture_path: str, images: Iterable[Image.Image],
+    annotations: List[ImageAnnotation]
+) -> None:
+    fixture = {
+        frame_hash(image): {
+            "description": annotation.description,
+            "playerName": annotation.player_name,
+        } for image, annotation in zip(images, annotations)
+    }
+    with open(fixture_path, "w", encoding="utf-8") as f:
+        json.dump(fixture, f, ensure_ascii=False, indent=2)
+
+
+class StubBackend(OCRBackend):
+    # returns empty annotations after sleeping latency_secs, roughly the
+    # duration of a Vision API round trip
+    name = OCR_BACKEND_STUB
+    persistent = False
+
+    def __init__(self, latency_secs: float = DEFAULT_STUB_LATENCY_SECS) -> None:
+        self.latency_secs = latency_secs
+
+    def annotate_images(
+        self, images: Iterable[Image.Image]
+    ) -> List[ImageAnnotation]:
+        result = [ImageAnnotation("", "") for _ in images]
+        time.sleep(self.latency_secs)
+        return result
+
+
+class FallbackBackend(OCRBackend):
+    # uses fallback when primary fails or takes longer than timeout_secs
+    # (the late primary call is left to finish in the background; results
+    # are looked up under the name of primary, and those of fallback are
+    # cached under its own name only)
+    def __init__(
+        self, primary: OCRBackend, fallback: OCRBackend, timeout_secs: float
+    ) -> None:
+        self.primary = primary
+        self.fallback = fallback
+        self.timeout_secs = timeout_secs
+        self.name = primary.name
+        self.persistent = primary.persistent
+        # bounded, so that calls to a primary that hangs do not pile up;
+        # calls still waiting for a thread when they time out are dropped
+        self.executor = ThreadPoolExecutor(
+            max_workers=FALLBACK_MAX_PRIMARY_CALLS
+        )
+
+    def annotate_images(
+        self, images: Iterable[Image.Image]
+    ) -> List[ImageAnnotation]:
+        return self.annotate_images_by(images)[0]
+
+    def annotate_images_by(
+        self, images: Iterable[Image.Image]
+    ) -> Tuple[List[ImageAnnotation], OCRBackend]:
+        # images are read twice at most; those iterable more than once
+        # (GifManager, frames selected by FrameOcrCache) are decoded again
+        # rather than kept in memory, one-shot iterators are kept
+        if iter(images) is images:
+            images = list(images)
+        future = self.executor.submit(self.primary.annotate_images_by, images)
+        try:
+            return future.result(timeout=self.timeout_secs)
+        except TimeoutError:
+            future.cancel()
+            print(f"OCR by {self.primary.name} timed out, "
+                  + f"falling back to {self.fallback.name}")
+        except Exception as e:
+            print(f"OCR by {self.primary.name} failed, "
+                  + f"falling back to {self.fallback.name}:", e)
+        return self.fallback.annotate_images_by(images)
+
+
+def create_ocr_backend(name: str) -> OCRBackend:
+    if name == OCR_BACKEND_VISION:
+        return VisionBackend()
+    elif name == OCR_BACKEND_TESSERACT:
+        return TesseractBackend(os.environ.get(
+            "OCR_TESSERACT_LANG", DEFAULT_TESSERACT_LANG
+        ))
+    elif name == OCR_BACKEND_REPLAY:
+        return FixtureReplayBackend(os.environ["OCR_FIXTURE_FILE"])
+    elif name == OCR_BACKEND_STUB:
+        return StubBackend(float(os.environ.get(
+            "OCR_STUB_LATENCY_SECS", DEFAULT_STUB_LATENCY_SECS
+        )))
+    else:
+        raise ValueError(f"Unknown OCR backend: {name}")
+
+
+def get_ocr_backend_name() -> str:
+    # name of the backend get_ocr_backend() creates, without creating it
+    return os.environ.get("OCR_BACKEND", OCR_BACKEND_VISION)
+
+
+def get_ocr_backend() -> OCRBackend:
+    # configured by environment variables:
+    #   OCR_BACKEND: vision (default), tesseract, replay or stub
+    #   OCR_FALLBACK_BACKEND: backend used when OCR_BACKEND fails or
+    #       exceeds OCR_FALLBACK_TIMEOUT_SECS (no fallback by default)
+    #   OCR_TESSERACT_LANG, OCR_FIXTURE_FILE, OCR_STUB_LATENCY_SECS:
+    #       settings of each backend
+    backend = create_ocr_backend(get_ocr_backend_name())
+    fallback_name = os.environ.get("OCR_FALLBACK_BACKEND")
+    if fallback_name:
+        backend = FallbackBackend(
+            backend,
+            create_ocr_backend(fallback_name),
+            float(os.environ.get("OCR_FALLBACK_TIMEOUT_SECS", "30"))
+        )
+    return backend
+
+
+if __name__ == "__main__":
+    # records annotations of the configured backend as a fixture:
+    # python -m ocr.backends -g album.gif -o fixture.json
+    import argparse
+
+    from ocr.gif import GifManager
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-g", "--gif", required=True)
+    ap.add_argument("-o", "--output", required=True)
+    args = ap.parse_args()
+
+    gm = GifManager(args.gif)
+    annotations = get_ocr_backend().annotate_images(gm)
+    write_fixture(args.output, gm, annotations)
+    print(annotations)
@@ -0,0 +1,41 @@
+import argparse
+import time
+from typing import List
+
+from PIL import Image
+
+from fake_vision import FakeImageAnnotatorClient
+from image_annotator import annotate_images, gapi_max_in_flight_batches
+
+
+def make_sample_frames(n_frames: int) -> List[Image.Image]:
+    noise = Image.effect_noise((720, 540), 48).convert("RGB")
+    return [noise.rotate(i * 7) for i in range(n_frames)]
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-f", "--frames", type=int, nargs="+",
+                    default=[10, 50, 150, 500])
+    ap.add_argument("-l", "--latency", type=float, default=0.3)
+    ap.add_argument("-p", "--per-image", type=float, default=0.1)
+    ap.add_argument("-b", "--max-batch-size", type=int, default=16)
+    ap.add_argument("-i", "--max-in-flight", type=int,
+                    default=gapi_max_in_flight_batches())
+    args = ap.parse_args()
+
+    for n_frames in args.frames:
+        frames = make_sample_frames(n_frames)
+        print(f"{n_frames} frames")
+        for max_in_flight in sorted({1, args.max_in_flight}):
+            client = FakeImageAnnotatorClient(args.latency, args.per_image)
+            start = time.perf_counter()
+            annotate_images(
+                frames,
+                client=client,
+                max_batch_size=args.max_batch_size,
+                max_in_flight_batches=max_in_flight
+            )
+            secs = time.perf_counter() - start
+            print(f"  {max_in_flight} in flight: {secs:.3f}s "
+                  + f"({client.calls} calls, {n_frames / secs:.1f} frames/s)")
@@ -0,0 +1,77 @@
+import argparse
+import os
+import threading
+import time
+from typing import List
+
+from fake_vision import FakeImageAnnotatorClient, fake_response_id
+from image_annotator import AnnotateBatchDispatcher
+
+
+def make_request(caller: int, i: int) -> dict:
+    return {"image": {"content": f"{caller}-{i}".encode() + os.urandom(8)}}
+
+
+def run_callers(
+    n_callers: int, n_requests: int, client: FakeImageAnnotatorClient,
+    dispatcher: AnnotateBatchDispatcher = None
+) -> int:
+    # each caller sends its requests at once, either as its own batches or
+    # through the dispatcher; returns the number of misrouted responses
+    misrouted: List[int] = []
+    barrier = threading.Barrier(n_callers)
+
+    def caller(n: int) -> None:
+        requests = [make_request(n, i) for i in range(n_requests)]
+        barrier.wait()
+        if dispatcher is None:
+            responses = []
+            for i in range(0, len(requests), 16):
+                responses.extend(client.batch_annotate_images(
+                    requests=requests[i:i + 16]
+                ).responses)
+        else:
+            futures = [dispatcher.submit(request) for request in requests]
+            responses = [future.result() for future in futures]
+        for request, air in zip(requests, responses):
+            if air.text_annotations[0].description \
+                != fake_response_id(request):
+                misrouted.append(n)
+
+    threads = [
+        threading.Thread(target=caller, args=(n,)) for n in range(n_callers)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(misrouted)
+
+
+if __name__ == "__main__":
+    # with the default sizes every batch fills up before max wait, so the
+    # number of calls is deterministic
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-c", "--callers", type=int, default=8)
+    ap.add_argument("-r", "--requests", type=int, default=2)
+    ap.add_argument("-l", "--latency", type=float, default=0.3)
+    ap.add_argument("-p", "--per-image", type=float, default=0.01)
+    ap.add_argument("-w", "--max-wait-ms", type=float, default=1000)
+    args = ap.parse_args()
+
+    client = FakeImageAnnotatorClient(args.latency, args.per_image)
+    start = time.perf_counter()
+    misrouted = run_callers(args.callers, args.requests, client)
+    print(f"per caller: {time.perf_counter() - start:.3f}s, "
+          + f"{client.calls} calls, {misrouted} misrouted")
+
+    client = FakeImageAnnotatorClient(args.latency, args.per_image)
+    dispatcher = AnnotateBatchDispatcher(
+        client, max_wait_secs=args.max_wait_ms / 1000
+    )
+    start = time.perf_counter()
+    misrouted = run_callers(args.callers, args.requests, client, dispatcher)
+    print(f"dispatcher: {time.perf_counter() - start:.3f}s, "
+          + f"{client.calls} calls {client.batch_sizes}, "
+          + f"{misrouted} misrouted")
+    dispatcher.stop()
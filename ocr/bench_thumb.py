@@ -0,0 +1,115 @@
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+
+from PIL import Image
+
+from gif import THUMB_SIZE, GifManager, get_thumb_size
+
+
+def make_sample_gif(
+    path: str, n_frames: int, width: int, height: int, shared_palette: bool
+) -> None:
+    # moving gradient with noise, quantized like a screen capture would be
+    # (to a palette of each frame, or to that of the first frame only)
+    frames: List[Image.Image] = []
+    noise = Image.effect_noise((width, height), 48).convert("RGB")
+    for i in range(n_frames):
+        base = Image.linear_gradient("L").resize((width, height)).rotate(i * 7)
+        frame = Image.merge("RGB", (base, base.transpose(Image.Transpose.FLIP_LEFT_RIGHT), base))
+        frame = Image.blend(frame, noise, 0.3)
+        if shared_palette and len(frames):
+            frames.append(frame.quantize(palette=frames[0]))
+        else:
+            frames.append(frame.quantize(colors=256))
+    # (Pillow writes a local palette for every frame unless given one)
+    palette = frames[0].getpalette() if shared_palette else None
+    frames[0].save(path, save_all=True, append_images=frames[1:], loop=0,
+                   palette=palette)
+
+
+def save_thumb_legacy(src: str, dst: str) -> None:
+    # implementation before the thumbnail pipeline was introduced
+    with Image.open(src) as image:
+        thumb_images: List[Image.Image] = []
+        for i in range(image.n_frames):
+            image.seek(i)
+            frame = image.copy()
+            frame.thumbnail(THUMB_SIZE)
+            thumb_images.append(frame)
+    thumb_images[0].save(dst, save_all=True, append_images=thumb_images[1:], loop=0)
+
+
+def save_thumb_global_palette(gm: GifManager, dst: str) -> None:
+    # the pipeline with frames mapped to the global palette of the GIF
+    # instead of quantized one by one (valid only without local palettes)
+    with Image.open(gm.src_path) as image:
+        palette = Image.new("P", (1, 1))
+        palette.putpalette(image.getpalette())
+    thumb_images: List[Image.Image] = []
+    for i, image in enumerate(gm.iter_frames()):
+        if i == 0:
+            size = get_thumb_size(image.size, THUMB_SIZE)
+        image = image.convert("RGB")
+        factor = min(image.width // size[0], image.height // size[1])
+        if factor >= 2:
+            image = image.reduce(factor)
+        image = image.resize(size, Image.Resampling.BILINEAR)
+        thumb_images.append(image.quantize(palette=palette, dither=Image.Dither.NONE))
+    thumb_images[0].save(dst, save_all=True, append_images=thumb_images[1:], loop=0)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-g", "--gif", nargs="*", default=[])
+    ap.add_argument("-f", "--frames", type=int, nargs="+", default=[30, 150])
+    ap.add_argument("-s", "--sizes", nargs="+", default=["640x360", "1280x720"])
+    ap.add_argument("-w", "--workers", type=int, default=os.cpu_count())
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        gifs: List[str] = list(args.gif)
+        for n_frames in args.frames:
+            for size in args.sizes:
+                for shared_palette in (False, True):
+                    width, height = (int(n) for n in size.split("x"))
+                    name = f"{n_frames}_{size}" \
+                        + ("_global" if shared_palette else "_local")
+                    path = os.path.join(tmp, f"{name}.gif")
+                    make_sample_gif(path, n_frames, width, height, shared_palette)
+                    gifs.append(path)
+
+        dst = os.path.join(tmp, "thumb.gif")
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            for path in gifs:
+                gm = GifManager(path)
+                with Image.open(path) as image:
+                    label = f"{os.path.basename(path)} ({gm.n_frames} frames, {image.width}x{image.height})"
+
+                start = time.perf_counter()
+                save_thumb_legacy(path, dst)
+                legacy_secs = time.perf_counter() - start
+
+                start = time.perf_counter()
+                gm.save_thumb(dst)
+                serial_secs = time.perf_counter() - start
+
+                serial_bytes = os.path.getsize(dst)
+
+                start = time.perf_counter()
+                gm.save_thumb(dst, executor=executor)
+                pool_secs = time.perf_counter() - start
+
+                start = time.perf_counter()
+                save_thumb_global_palette(gm, dst)
+                global_secs = time.perf_counter() - start
+                global_bytes = os.path.getsize(dst)
+
+                print(label)
+                print(f"  legacy:               {legacy_secs:.3f}s")
+                print(f"  pipeline:             {serial_secs:.3f}s, {serial_bytes} bytes")
+                print(f"  pipeline ({args.workers} workers): {pool_secs:.3f}s")
+                print(f"  global palette:       {global_secs:.3f}s, {global_bytes} bytes")
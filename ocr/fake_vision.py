@@ -0,0 +1,58 @@
+import hashlib
+import threading
+import time
+from typing import List
+
+from google.api_core.exceptions import InvalidArgument
+from google.cloud.vision_v1.types import (
+    AnnotateImageResponse, BatchAnnotateImagesResponse, EntityAnnotation
+)
+
+
+FAKE_VISION_MAX_BATCH_SIZE = 16
+
+
+def fake_response_id(request: dict) -> str:
+    # what FakeImageAnnotatorClient answers for the request as the whole
+    # text annotation, to check responses are routed to their requests
+    return hashlib.sha256(request["image"]["content"]).hexdigest()[:16]
+
+
+class FakeImageAnnotatorClient:
+    # stand-in for ImageAnnotatorClient to benchmark request handling
+    # offline: sleeps like a Vision API round trip and returns no text
+    # in the annotated regions
+    # (latency_secs per call plus per_image_secs per image)
+    latency_secs: float
+    per_image_secs: float
+    calls: int
+    batch_sizes: List[int]
+
+    def __init__(
+        self, latency_secs: float = 0.3, per_image_secs: float = 0.1
+    ) -> None:
+        self.latency_secs = latency_secs
+        self.per_image_secs = per_image_secs
+        self.calls = 0
+        self.batch_sizes = []
+        self.lock = threading.Lock()
+
+    def batch_annotate_images(
+        self, requests: List[dict]
+    ) -> BatchAnnotateImagesResponse:
+        if len(requests) > FAKE_VISION_MAX_BATCH_SIZE:
+            raise InvalidArgument(
+                f"At most {FAKE_VISION_MAX_BATCH_SIZE} images allowed "
+                + "per request."
+            )
+        with self.lock:
+            self.calls += 1
+            self.batch_sizes.append(len(requests))
+        time.sleep(self.latency_secs + self.per_image_secs * len(requests))
+        return BatchAnnotateImagesResponse(
+            responses=[
+                AnnotateImageResponse(text_annotations=[
+                    EntityAnnotation(description=fake_response_id(request))
+                ]) for request in requests
+            ]
+        )
@@ -1,30 +1,129 @@
-from typing import List
+import os
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from typing import Deque, Iterator, List, Tuple, Union
 
 from PIL import Image
 
 
 THUMB_SIZE = (250, 250)
 
+# frames sent to a worker process at once, and batches kept in flight
+# (bounds the number of decoded frames held in memory)
+THUMB_BATCH_FRAMES = 16
+THUMB_MAX_BATCHES_IN_FLIGHT = 4
+
+
+def get_thumb_size(
+    size: Tuple[int, int], max_size: Tuple[int, int]
+) -> Tuple[int, int]:
+    # fit into max_size keeping aspect ratio (never enlarges)
+    ratio = min(max_size[0] / size[0], max_size[1] / size[1], 1)
+    return (
+        max(1, round(size[0] * ratio)),
+        max(1, round(size[1] * ratio)),
+    )
+
+
+def make_thumb_frame(image: Image.Image, size: Tuple[int, int]) -> Image.Image:
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert(
+            "RGBA" if "transparency" in image.info else "RGB"
+        )
+
+    # cheap integer box reduction first, then resample to the exact size
+    factor = min(image.width // size[0], image.height // size[1])
+    if factor >= 2:
+        image = image.reduce(factor)
+    image = image.resize(size, Image.Resampling.BILINEAR)
+
+    # quantize the small frame with the fast octree quantizer, so that the
+    # GIF encoder does not compute a median cut palette for every frame
+    # (mapping frames to the global palette instead is no faster, since
+    # decoding dominates, and makes files twice as large or more; see
+    # ocr/bench_thumb.py)
+    if image.mode == "RGB":
+        image = image.quantize(
+            method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE
+        )
+    return image
+
+
+def make_thumb_frames(
+    images: List[Image.Image], size: Tuple[int, int]
+) -> List[Image.Image]:
+    # entry point for worker processes
+    return [make_thumb_frame(image, size) for image in images]
+
+
+thumb_executor: Union[ProcessPoolExecutor, None] = None
+
+
+def get_thumb_executor() -> Union[ProcessPoolExecutor, None]:
+    # process pool for thumbnailing, enabled by THUMB_PROCESS_WORKERS
+    global thumb_executor
+    if thumb_executor is None:
+        workers = int(os.environ.get("THUMB_PROCESS_WORKERS", "0"))
+        if workers > 0:
+            thumb_executor = ProcessPoolExecutor(max_workers=workers)
+    return thumb_executor
+
 
 class GifManager:
     src_path: str
-    images: List[Image.Image]
+    n_frames: int
 
     def __init__(self, gif_path: str) -> None:
         self.src_path = gif_path
-        self.images = []
 
+        # counting frames does not decode them
         with Image.open(gif_path) as image:
+            self.n_frames = image.n_frames
+
+    def __iter__(self) -> Iterator[Image.Image]:
+        # a GifManager can be iterated any number of times
+        return self.iter_frames()
+
+    def iter_frames(self) -> Iterator[Image.Image]:
+        # decode frames one at a time
+        # (each yielded frame is a copy the caller may keep or modify)
+        with Image.open(self.src_path) as image:
             for i in range(image.n_frames):
                 image.seek(i)
-                self.images.append(image.copy())
-    
-    def save_thumb(self, dst: str) -> None:
+                yield image.copy()
+
+    def save_thumb(
+        self, dst: str, executor: Union[Executor, None] = None
+    ) -> None:
+        if executor is None:
+            executor = get_thumb_executor()
+
         thumb_images: List[Image.Image] = []
-        for image in self.images:
-            thumb_image = image.copy()
-            thumb_image.thumbnail(THUMB_SIZE)
-            thumb_images.append(thumb_image)
+        futures: Deque[Future] = deque()
+        batch: List[Image.Image] = []
+        size = THUMB_SIZE
+        for i, image in enumerate(self.iter_frames()):
+            if i == 0:
+                size = get_thumb_size(image.size, THUMB_SIZE)
+
+            if executor is None:
+                thumb_images.append(make_thumb_frame(image, size))
+                continue
+
+            batch.append(image)
+            if len(batch) == THUMB_BATCH_FRAMES:
+                futures.append(executor.submit(
+                    make_thumb_frames, batch, size
+                ))
+                batch = []
+                if len(futures) >= THUMB_MAX_BATCHES_IN_FLIGHT:
+                    thumb_images.extend(futures.popleft().result())
+        if len(batch):
+            futures.append(executor.submit(
+                make_thumb_frames, batch, size
+            ))
+        while len(futures):
+            thumb_images.extend(futures.popleft().result())
 
         thumb_images[0].save(
             dst,
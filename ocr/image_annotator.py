@@ -1,6 +1,12 @@
+import hashlib
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass
 from io import BytesIO
-from typing import List
+from typing import Iterable, List, Tuple, Union
 
 from google.cloud.vision import ImageAnnotatorClient
 from google.cloud.vision_v1.types import Feature
@@ -11,11 +17,51 @@ from PIL import Image
 GAPI_ENDPOINT = "https://vision.googleapis.com/v1/images:annotate"
 GAPI_CRED_FILE = "google_api_credentials.json"
 
+# images per batch_annotate_images call (the API accepts up to 16) and
+# number of calls in flight at once
+# (GAPI_MAX_BATCH_SIZE and GAPI_MAX_IN_FLIGHT_BATCHES override them when
+# annotating, after .env is loaded)
+DEFAULT_GAPI_MAX_BATCH_SIZE = 16
+DEFAULT_GAPI_MAX_IN_FLIGHT_BATCHES = 4
+JPEG_ENCODE_WORKERS = 4
+
+# how long AnnotateBatchDispatcher waits for more requests to fill a batch
+# (GAPI_BATCH_MAX_WAIT_MS overrides it when the dispatcher is created)
+DEFAULT_GAPI_BATCH_MAX_WAIT_MS = 20
+
 AREA_BOUND_SUBT = ((95, 143), (673, 393))
 AREA_BOUND_PLAYER = ((21, 461), (627, 496))
 
 DEFAULT_LANG_HINT = "ja"
 
+REGION_SUBT = 0
+REGION_PLAYER = 1
+
+# regions cropped from frames are stacked into mosaics of at most this
+# height, separated by blank gaps so that text never spans two tiles
+# (single column keeps Vision from joining lines of different frames)
+MOSAIC_MAX_HEIGHT = 4096
+MOSAIC_TILE_GAP = 24
+MOSAIC_BACKGROUND = (0, 0, 0)
+
+
+def gapi_max_batch_size() -> int:
+    return int(os.environ.get(
+        "GAPI_MAX_BATCH_SIZE", DEFAULT_GAPI_MAX_BATCH_SIZE
+    ))
+
+
+def gapi_max_in_flight_batches() -> int:
+    return int(os.environ.get(
+        "GAPI_MAX_IN_FLIGHT_BATCHES", DEFAULT_GAPI_MAX_IN_FLIGHT_BATCHES
+    ))
+
+
+def gapi_batch_max_wait_secs() -> float:
+    return float(os.environ.get(
+        "GAPI_BATCH_MAX_WAIT_MS", DEFAULT_GAPI_BATCH_MAX_WAIT_MS
+    )) / 1000
+
 
 @dataclass
 class ImageAnnotation:
@@ -23,24 +69,294 @@ class ImageAnnotation:
     player_name: str
 
 
+@dataclass
+class MosaicTile:
+    frame_index: int
+    region: int
+    # (left, upper, right, lower) in the mosaic
+    box: Tuple[int, int, int, int]
+
+
+@dataclass
+class Mosaic:
+    image: Image.Image
+    tiles: List[MosaicTile]
+
+
+# word recognized in a mosaic with its (left, upper, right, lower) box
+MosaicWord = Tuple[str, Tuple[int, int, int, int]]
+
+
+def frame_hash(image: Image.Image) -> str:
+    # SHA-256 of the pixels of the regions annotations are taken from, so
+    # that frames with exactly the same subtitle and player name share OCR
+    # results (decoding a GIF is lossless: repeated frames and re-uploads
+    # match, while any changed pixel such as a dakuten changes the key)
+    hasher = hashlib.sha256()
+    for (left, upper), (right, lower) in (AREA_BOUND_SUBT, AREA_BOUND_PLAYER):
+        region = image.crop((left, upper, right, lower)).convert("RGB")
+        hasher.update(region.tobytes())
+    return hasher.hexdigest()
+
+
+class MosaicBuilder:
+    # stacks crops of one region top to bottom, starting a new mosaic
+    # when MOSAIC_MAX_HEIGHT would be exceeded
+    region: int
+    bound: Tuple[Tuple[int, int], Tuple[int, int]]
+    mosaics: List[Mosaic]
+    crops: List[Tuple[int, Image.Image]]
+    height: int
+
+    def __init__(
+        self, region: int, bound: Tuple[Tuple[int, int], Tuple[int, int]]
+    ) -> None:
+        self.region = region
+        self.bound = bound
+        self.mosaics = []
+        self.crops = []
+        self.height = 0
+
+    def add(self, frame_index: int, image: Image.Image) -> None:
+        (left, upper), (right, lower) = self.bound
+        crop = image.crop((left, upper, right, lower))
+        if len(self.crops) and \
+            self.height + MOSAIC_TILE_GAP + crop.height > MOSAIC_MAX_HEIGHT:
+            self.flush()
+        if len(self.crops):
+            self.height += MOSAIC_TILE_GAP
+        self.crops.append((frame_index, crop))
+        self.height += crop.height
+
+    def flush(self) -> None:
+        if len(self.crops) == 0:
+            return
+        width = max(crop.width for _, crop in self.crops)
+        image = Image.new("RGB", (width, self.height), MOSAIC_BACKGROUND)
+        tiles: List[MosaicTile] = []
+        y = 0
+        for frame_index, crop in self.crops:
+            image.paste(crop, (0, y))
+            tiles.append(MosaicTile(
+                frame_index,
+                self.region,
+                (0, y, crop.width, y + crop.height)
+            ))
+            y += crop.height + MOSAIC_TILE_GAP
+        self.mosaics.append(Mosaic(image, tiles))
+        self.crops = []
+        self.height = 0
+
+
+def build_mosaics(images: Iterable[Image.Image]) -> Tuple[List[Mosaic], int]:
+    # crops the subtitle and player regions of every frame into mosaics,
+    # returns them with the number of frames
+    subt_builder = MosaicBuilder(REGION_SUBT, AREA_BOUND_SUBT)
+    player_builder = MosaicBuilder(REGION_PLAYER, AREA_BOUND_PLAYER)
+    n_frames = 0
+    for image in images:
+        image = image.convert("RGB")
+        subt_builder.add(n_frames, image)
+        player_builder.add(n_frames, image)
+        n_frames += 1
+    subt_builder.flush()
+    player_builder.flush()
+    return subt_builder.mosaics + player_builder.mosaics, n_frames
+
+
+def assign_words(
+    mosaics: List[Mosaic], words_per_mosaic: Iterable[List[MosaicWord]],
+    n_frames: int
+) -> List[ImageAnnotation]:
+    # maps words recognized in each mosaic back to the frame and region of
+    # the tile that contains them
+    result = [ImageAnnotation("", "") for _ in range(n_frames)]
+    for mosaic, words in zip(mosaics, words_per_mosaic):
+        for text, (word_left, word_upper, word_right, word_lower) in words:
+            for tile in mosaic.tiles:
+                left, upper, right, lower = tile.box
+                if word_left > left and \
+                    word_upper > upper and \
+                    word_right < right and \
+                    word_lower < lower:
+                    annotation = result[tile.frame_index]
+                    if tile.region == REGION_SUBT:
+                        annotation.description += text
+                    else:
+                        annotation.player_name = text
+                    break
+    return result
+
+
+def collect_annotations(
+    mosaics: List[Mosaic], responses: Iterable, n_frames: int
+) -> List[ImageAnnotation]:
+    # assign_words() for Google Vision API responses
+    def words_of(air) -> List[MosaicWord]:
+        words: List[MosaicWord] = []
+        # (the first annotation is the whole text of the mosaic)
+        for text in list(air.text_annotations)[1:]:
+            vertices = text.bounding_poly.vertices
+            if len(vertices) != 4:
+                continue
+            words.append((
+                text.description,
+                (vertices[0].x, vertices[0].y, vertices[2].x, vertices[2].y)
+            ))
+        return words
+
+    return assign_words(
+        mosaics, (words_of(air) for air in responses), n_frames
+    )
+
+
+annotator_client: Union[ImageAnnotatorClient, None] = None
+annotator_client_lock = threading.Lock()
+
+
+def get_annotator_client() -> ImageAnnotatorClient:
+    # created once per process and reused
+    # (loading credentials and opening a channel per call is slow)
+    global annotator_client
+    with annotator_client_lock:
+        if annotator_client is None:
+            credentials = service_account.Credentials \
+                .from_service_account_file(GAPI_CRED_FILE)
+            annotator_client = ImageAnnotatorClient(credentials=credentials)
+    return annotator_client
+
+
+class AnnotateBatchDispatcher:
+    # shares batch_annotate_images calls among concurrent annotate_images
+    # callers: requests are collected until max_batch_size of them are
+    # queued or max_wait_secs has passed since the first, then sent as
+    # one batch, and each caller gets its own response through a Future
+    client: ImageAnnotatorClient
+    max_batch_size: int
+    max_wait_secs: float
+    requests: "queue.Queue[Union[Tuple[dict, Future], None]]"
+    thread: Union[threading.Thread, None]
+
+    def __init__(
+        self,
+        client: ImageAnnotatorClient,
+        max_batch_size: Union[int, None] = None,
+        max_wait_secs: Union[float, None] = None,
+        max_in_flight_batches: Union[int, None] = None
+    ) -> None:
+        # (None reads the setting from the environment)
+        if max_batch_size is None:
+            max_batch_size = gapi_max_batch_size()
+        if max_wait_secs is None:
+            max_wait_secs = gapi_batch_max_wait_secs()
+        if max_in_flight_batches is None:
+            max_in_flight_batches = gapi_max_in_flight_batches()
+        self.client = client
+        self.max_batch_size = max_batch_size
+        self.max_wait_secs = max_wait_secs
+        self.requests = queue.Queue()
+        self.executor = ThreadPoolExecutor(max_workers=max_in_flight_batches)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def submit(self, request: dict) -> Future:
+        future: Future = Future()
+        self.requests.put((request, future))
+        return future
+
+    def send(self, batch: List[Tuple[dict, Future]]) -> None:
+        try:
+            response = self.client.batch_annotate_images(
+                requests=[request for request, _ in batch]
+            )
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        if len(response.responses) != len(batch):
+            # which response belongs to which request is unknown
+            e = RuntimeError(
+                f"{len(response.responses)} responses "
+                + f"for {len(batch)} requests"
+            )
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, future), air in zip(batch, response.responses):
+            future.set_result(air)
+
+    def run(self) -> None:
+        while True:
+            item = self.requests.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait_secs
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self.requests.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    # send what is collected, then stop
+                    self.requests.put(None)
+                    break
+                batch.append(item)
+            self.executor.submit(self.send, batch)
+
+    def stop(self) -> None:
+        # sends requests already submitted and waits for their responses
+        if self.thread is not None:
+            self.requests.put(None)
+            self.thread.join()
+            self.thread = None
+        self.executor.shutdown(wait=True)
+
+
+def encode_jpeg(image: Image.Image) -> bytes:
+    buffer = BytesIO()
+    image.save(buffer, "jpeg")
+    return buffer.getvalue()
+
+
 def annotate_images(
-    images: List[Image.Image], lang_hint: str = DEFAULT_LANG_HINT
+    images: Iterable[Image.Image], lang_hint: str = DEFAULT_LANG_HINT,
+    client: Union[ImageAnnotatorClient, None] = None,
+    max_batch_size: Union[int, None] = None,
+    max_in_flight_batches: Union[int, None] = None,
+    dispatcher: Union[AnnotateBatchDispatcher, None] = None
 ) -> List[ImageAnnotation]:
-    # load credentials
-    credentials = service_account.Credentials \
-        .from_service_account_file(GAPI_CRED_FILE)
-    
-    # prepare client
-    client = ImageAnnotatorClient(credentials=credentials)
+    # with dispatcher, requests are batched together with those of other
+    # threads (client and batch settings of the dispatcher apply)
+    # (None batch settings are read from the environment)
+    if client is None and dispatcher is None:
+        client = get_annotator_client()
+    if max_batch_size is None:
+        max_batch_size = gapi_max_batch_size()
+    if max_in_flight_batches is None:
+        max_in_flight_batches = gapi_max_in_flight_batches()
+
+    # only the regions annotations are taken from are sent, packed into
+    # a few mosaic images
+    mosaics, n_frames = build_mosaics(images)
+    if len(mosaics) == 0:
+        return []
+
+    # (Pillow releases the GIL while encoding)
+    with ThreadPoolExecutor(max_workers=JPEG_ENCODE_WORKERS) as executor:
+        contents = list(executor.map(
+            encode_jpeg, (mosaic.image for mosaic in mosaics)
+        ))
 
     # create request object formatted for Google Vision API
     gapi_request_param: List[dict] = []
-    for image in images:
-        buffer = BytesIO()
-        image.convert("RGB").save(buffer, "jpeg")
+    for content in contents:
         gapi_request_param.append({
             "image": {
-                "content": buffer.getvalue()
+                "content": content
             },
             "features": [{
                 "type_": Feature.Type.DOCUMENT_TEXT_DETECTION
@@ -50,30 +366,26 @@ def annotate_images(
             }
         })
 
-    # call API
-    response = client.batch_annotate_images(requests=gapi_request_param)
+    if dispatcher is not None:
+        futures = [
+            dispatcher.submit(request) for request in gapi_request_param
+        ]
+        responses = [future.result() for future in futures]
+        return collect_annotations(mosaics, responses, n_frames)
 
-    # filter results to format into ImageAnnotation
-    result: List[ImageAnnotation] = []
-    for air in response.responses:
-        subt_str = ""
-        player_str = ""
-        for text in air.text_annotations:
-            vertices = text.bounding_poly.vertices
-            if len(vertices) != 4:
-                continue
+    # call API in batches, some of them at once
+    batches = [
+        gapi_request_param[i:i + max_batch_size]
+        for i in range(0, len(gapi_request_param), max_batch_size)
+    ]
+    with ThreadPoolExecutor(max_workers=max_in_flight_batches) as executor:
+        batch_responses = list(executor.map(
+            lambda batch: client.batch_annotate_images(requests=batch),
+            batches
+        ))
+    responses = [
+        air for response in batch_responses for air in response.responses
+    ]
 
-            if vertices[0].x > AREA_BOUND_SUBT[0][0] and \
-                vertices[0].y > AREA_BOUND_SUBT[0][1] and \
-                vertices[2].x < AREA_BOUND_SUBT[1][0] and \
-                vertices[2].y < AREA_BOUND_SUBT[1][1]:
-                subt_str += text.description
-            elif vertices[0].x > AREA_BOUND_PLAYER[0][0] and \
-                vertices[0].y > AREA_BOUND_PLAYER[0][1] and \
-                vertices[2].x < AREA_BOUND_PLAYER[1][0] and \
-                vertices[2].y < AREA_BOUND_PLAYER[1][1]:
-                player_str = text.description
-        
-        result.append(ImageAnnotation(subt_str, player_str))
-    
-    return result
+    # filter results to format into ImageAnnotation
+    return collect_annotations(mosaics, responses, n_frames)
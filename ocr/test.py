@@ -12,4 +12,4 @@ if __name__ == "__main__":
     gm = GifManager(args.gif)
     print("Saved:", gm.save_thumb())
 
-    print(annotate_images(gm.images))
+    print(annotate_images(gm.iter_frames()))
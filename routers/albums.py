@@ -3,27 +3,58 @@ import binascii
 import datetime
 import os
 import hashlib
+import json
 import uuid
 from typing import Dict, List, Union
 
 import requests
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
-from fastapi.responses import FileResponse
+from fastapi import (
+    APIRouter, Depends, HTTPException, Request, status
+)
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import (
+    RedirectResponse, Response, StreamingResponse
+)
+from PIL import UnidentifiedImageError
 from pydantic import BaseModel
 from pydantic.alias_generators import to_camel
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from auth.auth import UserInfo
+from auth.auth import CurrentUser, UserInfo
+from ocr.backends import get_ocr_backend_name
 from ocr.gif import GifManager
-from ocr.image_annotator import annotate_images
+from routers.conditional import (
+    collection_validator_headers, etag_matches, if_range_matches,
+    is_not_modified, make_etag, not_modified_response, validator_headers
+)
+from routers.file_response import file_response
 from routers.json_response import json_response
-from sql_interface import crud, models, schemas
-from sql_interface.database import get_db
-from storage.s3 import upload
+from routers.multipart_stream import iter_first_file
+from sql_interface import crud, crud_async, models, schemas
+from sql_interface.counter_buffer import album_counter_buffer
+from sql_interface.database import get_async_db, get_db
+from storage.backend import content_key, get_storage_backend
+from storage.disk_cache import get_album_disk_cache
+from storage.stream import iter_stream, open_stream, stream_headers
 
 
 TEMP_DIR_NAME = "temp_albums"
-STORAGE_DIR_NAME = "albums/v1"
+
+UPLOAD_CHUNK_SIZE = 64 * 1024 # 64 KiB
+TEMP_ALBUM_MAX_BYTES = 64 * 1024 * 1024 # 64 MiB
+# boundaries, part headers and other fields allowed around the file
+# in multipart bodies
+TEMP_ALBUM_MAX_FORM_OVERHEAD_BYTES = 64 * 1024 # 64 KiB
+
+# GET /albums/{id}/raw relays the file (proxy) or redirects to it
+ALBUM_RAW_MODE_PROXY = "proxy"
+ALBUM_RAW_MODE_REDIRECT = "redirect"
+ALBUM_RAW_RELAYED_STATUSES = (
+    status.HTTP_200_OK, status.HTTP_206_PARTIAL_CONTENT,
+    status.HTTP_304_NOT_MODIFIED, status.HTTP_412_PRECONDITION_FAILED,
+    status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+)
 
 GET_ALBUMS_ORDER_BY_PAT_STR = "playedAt"
 GET_ALBUMS_ORDER_BY_PVC_STR = "pvCount"
@@ -55,13 +86,62 @@ def ga_order_str_to_en(s: str):
         return crud.GET_ALBUMS_ORDER_DESC
     else:
         raise ValueError()
+
+GET_ALBUMS_COUNT_EXACT_STR = "exact"
+GET_ALBUMS_COUNT_ESTIMATED_STR = "estimated"
+
+def ga_countmode_str_to_en(s: str):
+    if s == GET_ALBUMS_COUNT_EXACT_STR:
+        return crud.GET_ALBUMS_COUNT_EXACT
+    elif s == GET_ALBUMS_COUNT_ESTIMATED_STR:
+        return crud.GET_ALBUMS_COUNT_ESTIMATED
+    else:
+        raise ValueError()
+
+def encode_albums_cursor(
+    order_by: str, order: str, cursor: crud.GetAlbumsCursor
+) -> str:
+    sort_value = cursor.sort_value
+    if isinstance(sort_value, datetime.datetime):
+        sort_value = sort_value.isoformat()
+    payload = {
+        "orderBy": order_by,
+        "order": order,
+        "sortValue": sort_value,
+        "playedAt": cursor.played_at.isoformat(),
+        "id": cursor.id,
+    }
+    return base64.urlsafe_b64encode(
+        json.dumps(payload, separators=(",", ":")).encode()
+    ).decode()
+
+def decode_albums_cursor(
+    s: str, order_by: str, order: str
+) -> crud.GetAlbumsCursor:
+    # raises ValueError if the cursor is malformed or issued for
+    # another ordering
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(s.encode()))
+        if payload["orderBy"] != order_by or payload["order"] != order:
+            raise ValueError()
+        sort_value = payload["sortValue"]
+        if order_by == GET_ALBUMS_ORDER_BY_PAT_STR:
+            sort_value = datetime.datetime.fromisoformat(sort_value)
+        elif not isinstance(sort_value, int):
+            raise ValueError()
+        played_at = datetime.datetime.fromisoformat(payload["playedAt"])
+        album_id = payload["id"]
+        if not isinstance(album_id, int):
+            raise ValueError()
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError,
+            KeyError, TypeError):
+        raise ValueError()
+    return crud.GetAlbumsCursor(sort_value, played_at, album_id)
     
 def date_to_album_filename(d: datetime.datetime):
     # example: album_2023-10-08_00-35-34.gif
     return "album_" + d.strftime("%Y-%m-%d_%H-%M-%S") + ".gif"
 
-def cleanup_downloaded_album_file(path: str):
-    os.remove(path)
 
 
 router = APIRouter()
@@ -71,26 +151,25 @@ def get_gif_path(uuid: str) -> str:
     return os.path.join(TEMP_DIR_NAME, f"{uuid}.gif")
 
 
-def temp_to_storage_path(temp_path: str) -> str:
-    return temp_path.replace(TEMP_DIR_NAME, STORAGE_DIR_NAME)
+def is_bookmarked_by(db: Session, user: CurrentUser, album_id: int) -> bool:
+    return album_id in crud.get_bookmarked_album_ids(db, user.id, [album_id])
 
 
-def serialize_album(album: models.Album, user: models.User) -> Dict:
-    is_bookmarked_map: Dict[int, bool] = {}
-    for bookmark_album in user.bookmark_albums:
-        is_bookmarked_map[bookmark_album.id] = True
-    
+def serialize_album(album: models.Album, is_bookmarked: bool) -> Dict:
+    # include increments not yet written to database
+    pending_pv, pending_dl = album_counter_buffer.pending(album.id)
+
     sorted_tags = sorted(album.tags, key=lambda x: x.id)
     sorted_pages = sorted(album.pages, key=lambda x: x.index)
     return {
         "id": album.id,
         "source": album.source,
         "thumbSource": album.thumb_source,
-        "pvCount": album.pv_count,
-        "downloadCount": album.download_count,
-        "bookmarkCount": len(album.bookmark_users),
-        "pageCount": len(album.pages),
-        "isBookmarked": is_bookmarked_map.get(album.id) is not None,
+        "pvCount": album.pv_count + pending_pv,
+        "downloadCount": album.download_count + pending_dl,
+        "bookmarkCount": album.bookmark_count,
+        "pageCount": album.page_count,
+        "isBookmarked": is_bookmarked,
         "playedAt": album.played_at,
         "contributorUserId": album.contributor_user_id,
         "gamemodeId": album.gamemode_id,
@@ -112,8 +191,9 @@ def serialize_album(album: models.Album, user: models.User) -> Dict:
 
 
 @router.get("/albums")
-def read_albums(
+async def read_albums(
     user_info: UserInfo,
+    request: Request,
     partialDescription: Union[str, None] = None,
     partialPlayerName: Union[str, None] = None,
     playedFrom: Union[int, None] = None,
@@ -125,7 +205,9 @@ def read_albums(
     limit: int = 100,
     orderBy: str = GET_ALBUMS_ORDER_BY_PAT_STR,
     order: str = GET_ALBUMS_ORDER_DESC_STR,
-    db: Session = Depends(get_db)
+    cursor: Union[str, None] = None,
+    countMode: str = GET_ALBUMS_COUNT_EXACT_STR,
+    db: AsyncSession = Depends(get_async_db)
 ):
     # validate orderBy and order strings
     try:
@@ -142,11 +224,40 @@ def read_albums(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Query parameter order is invalid.",
         )
+    try:
+        count_mode_en = ga_countmode_str_to_en(countMode)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Query parameter countMode is invalid.",
+        )
+
+    # decode cursor (offset is ignored when cursor is given)
+    get_albums_cursor = None
+    if cursor is not None:
+        try:
+            get_albums_cursor = decode_albums_cursor(cursor, orderBy, order)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Query parameter cursor is invalid.",
+            )
     
     filter_my_bookmark = myBookmark is not None and (len(myBookmark) > 0)
+
+    # unchanged since the client fetched it: skip querying albums
+    # (bookmarks of the user are part of the response)
+    albums_version = await crud_async.get_collection_version(
+        db, models.COLLECTION_ALBUMS
+    )
+    headers = collection_validator_headers(
+        albums_version, user_info.id, str(request.url.query)
+    )
+    if is_not_modified(request, headers):
+        return not_modified_response(headers)
     
     print("SELECT albums started:", datetime.datetime.now().astimezone().isoformat())
-    get_albums_result = crud.get_albums(
+    get_albums_result = await crud_async.get_albums(
         db, order_by_en, order_en, offset, limit,
         partialDescription,
         partialPlayerName, 
@@ -155,59 +266,97 @@ def read_albums(
         gamemodeId,
         partialTag,
         filter_my_bookmark,
-        user_info.id
+        user_info.id,
+        get_albums_cursor,
+        count_mode_en,
+        albums_version.version if albums_version is not None else None
     )
     print("SELECT albums finished:", datetime.datetime.now().astimezone().isoformat())
 
     
-    # create map of bookmarked or not by the user
-    is_bookmarked_map: Dict[int, bool] = {}
-    for bookmark_album in user_info.bookmark_albums:
-        is_bookmarked_map[bookmark_album.id] = True
+    # collect which of these albums are bookmarked by the user
+    bookmarked_album_ids = await crud_async.get_bookmarked_album_ids(
+        db, user_info.id, [row.album.id for row in get_albums_result.albums]
+    )
+    # include increments not yet written to database, as serialize_album
+    pending_counts = {
+        row.album.id: album_counter_buffer.pending(row.album.id)
+        for row in get_albums_result.albums
+    }
         
     return json_response({
         "albumsCountAll": get_albums_result.albums_count,
+        "albumsCountExact": get_albums_result.albums_count_exact,
+        "nextCursor": encode_albums_cursor(
+            orderBy, order, get_albums_result.next_cursor
+        ) if get_albums_result.next_cursor is not None else None,
         "albums": [
             {
-                "id": db_album.id,
-                "source": db_album.source,
-                "thumbSource": db_album.thumb_source,
-                "pvCount": db_album.pv_count,
-                "downloadCount": db_album.download_count,
-                "bookmarkCount": len(db_album.bookmark_users),
-                "pageCount": len(db_album.pages),
-                "isBookmarked": is_bookmarked_map.get(db_album.id) \
-                                    is not None,
-                "playedAt": db_album.played_at,
-                "createdAt": db_album.created_at,
-                "updatedAt": db_album.updated_at,
-            } for db_album in get_albums_result.albums
+                "id": row.album.id,
+                "source": row.album.source,
+                "thumbSource": row.album.thumb_source,
+                "pvCount": row.album.pv_count
+                    + pending_counts[row.album.id][0],
+                "downloadCount": row.album.download_count
+                    + pending_counts[row.album.id][1],
+                "bookmarkCount": row.num_bookmarks,
+                "pageCount": row.num_pages,
+                "isBookmarked": row.album.id in bookmarked_album_ids,
+                "playedAt": row.album.played_at,
+                "createdAt": row.album.created_at,
+                "updatedAt": row.album.updated_at,
+            } for row in get_albums_result.albums
         ]
-    })
+    }, headers=headers)
 
 
 @router.get("/albums/{album_id}")
-def read_album(
+async def read_album(
     user_info: UserInfo,
     album_id: int,
+    request: Request,
     incrementPv: str = "",
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_album = crud.get_album(
-        db, id=album_id, pv_increment=bool(len(incrementPv))
+    not_found_exception = HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail="Specified album does not exist."
+    )
+    # writes to the album, its tags, pages and bookmarks all touch
+    # updated_at, so it decides whether loading the album can be skipped
+    updated_at = await crud_async.get_album_updated_at(db, album_id)
+    if updated_at is None:
+        raise not_found_exception
+    if len(incrementPv):
+        # buffered and written later (see counter_buffer)
+        album_counter_buffer.add(album_id, pv=1)
+
+    # counts not yet written are part of the response but not of
+    # updated_at; Last-Modified is only given without them
+    pending = album_counter_buffer.pending(album_id)
+    headers = validator_headers(
+        make_etag(user_info.id, album_id, updated_at, pending),
+        updated_at if pending == (0, 0) else None
     )
+    if is_not_modified(request, headers):
+        return not_modified_response(headers)
+
+    db_album = await crud_async.get_album(db, id=album_id)
     if db_album is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Specified album does not exist."
-        )
-    return json_response(serialize_album(db_album, user_info))
+        raise not_found_exception
+    bookmarked_album_ids = await crud_async.get_bookmarked_album_ids(
+        db, user_info.id, [db_album.id]
+    )
+    return json_response(serialize_album(
+        db_album, db_album.id in bookmarked_album_ids
+    ), headers=headers)
 
 
 @router.get("/albums/{album_id}/raw")
 def read_album_data(
     user_info: UserInfo,
     album_id: int,
+    request: Request,
     db: Session = Depends(get_db)
 ):
     db_album = crud.get_album(
@@ -219,20 +368,94 @@ def read_album_data(
             detail="Specified album does not exist."
         )
     
-    # download to local
-    r = requests.get(db_album.source)
-    local_path = os.path.basename(db_album.source)
-    with open(local_path, "wb") as f:
-        f.write(r.content)
-
-    # delete local file later
-    bg = BackgroundTasks()
-    bg.add_task(cleanup_downloaded_album_file, local_path)
-
-    return FileResponse(
-        path=local_path,
-        filename=date_to_album_filename(db_album.played_at),
-        background=bg
+    if os.environ.get("ALBUM_RAW_MODE", ALBUM_RAW_MODE_PROXY) \
+            == ALBUM_RAW_MODE_REDIRECT:
+        # storage serves the file (and ranges) directly to the client
+        return RedirectResponse(
+            db_album.source, status_code=status.HTTP_307_TEMPORARY_REDIRECT
+        )
+
+    filename = date_to_album_filename(db_album.played_at)
+    content_disposition = f'attachment; filename="{filename}"'
+
+    bad_gateway_exception = HTTPException(
+        status_code=status.HTTP_502_BAD_GATEWAY,
+        detail="Failed to fetch album file from storage."
+    )
+    if not db_album.hash:
+        # relay the stored file in chunks; Range and conditional headers
+        # are forwarded so that storage answers 206/304/412/416 itself
+        try:
+            upstream = open_stream(db_album.source, request.headers)
+        except requests.RequestException:
+            raise bad_gateway_exception
+        if upstream.status_code not in ALBUM_RAW_RELAYED_STATUSES:
+            upstream.close()
+            raise bad_gateway_exception
+        headers = stream_headers(upstream)
+        if upstream.status_code in (status.HTTP_200_OK,
+                                    status.HTTP_206_PARTIAL_CONTENT):
+            headers["Content-Disposition"] = content_disposition
+        return StreamingResponse(
+            iter_stream(upstream),
+            status_code=upstream.status_code,
+            headers=headers
+        )
+
+    # the content hash is the only validator, whether the file comes from
+    # the disk cache or from storage, so conditions are evaluated here
+    etag = f'"{db_album.hash}"'
+    if etag_matches(request.headers.get("If-None-Match"), etag):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
+        )
+
+    # hot albums are served from local disk
+    cache = get_album_disk_cache()
+    if cache is not None:
+        f = cache.open(db_album.hash)
+        if f is not None:
+            return file_response(
+                request, f,
+                etag=etag,
+                media_type="image/gif",
+                headers={"Content-Disposition": content_disposition}
+            )
+
+    # relay the stored file in chunks, asking storage for the range only
+    # when If-Range allows it
+    upstream_headers = {}
+    range_header = request.headers.get("Range")
+    if range_header is not None \
+            and if_range_matches(request.headers.get("If-Range"), etag):
+        upstream_headers["Range"] = range_header
+    try:
+        upstream = open_stream(db_album.source, upstream_headers)
+    except requests.RequestException:
+        raise bad_gateway_exception
+    if upstream.status_code not in (
+        status.HTTP_200_OK, status.HTTP_206_PARTIAL_CONTENT,
+        status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+    ):
+        upstream.close()
+        raise bad_gateway_exception
+
+    headers = stream_headers(upstream)
+    headers.pop("ETag", None)
+    headers.pop("Last-Modified", None)
+    headers["ETag"] = etag
+    if upstream.status_code != \
+            status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE:
+        headers["Content-Disposition"] = content_disposition
+    if upstream.status_code == status.HTTP_200_OK and cache is not None:
+        # whole file: keep a copy for the next download
+        body = cache.iter_store(upstream, db_album.hash)
+    else:
+        body = iter_stream(upstream)
+    return StreamingResponse(
+        body,
+        status_code=upstream.status_code,
+        headers=headers
     )
 
 
@@ -299,21 +522,32 @@ def create_album(
         # doesn't allow TZ-unaware ISO format
         raise iso_exception
     
-    # generate thumbnail file
+    # store original while generating thumbnail file
+    # (keyed by content hash, so the same file is stored only once)
+    storage = get_storage_backend()
     file_path = get_gif_path(params.temporary_album_uuid)
+    original_upload = storage.submit_store(
+        file_path,
+        content_key(db_temp_album.hash, ".gif")
+    )
     thumb_path = file_path.replace(".gif", "_thumb.gif")
     gif = GifManager(file_path)
     gif.save_thumb(thumb_path)
     
-    # upload original and thumb to S3 bucket
-    s3_uri = upload(
-        file_path,
-        temp_to_storage_path(file_path)
-    )
-    s3_thumb_uri = upload(
+    # store thumb
+    thumb_upload_result = storage.store(
         thumb_path,
-        temp_to_storage_path(thumb_path)
+        content_key(db_temp_album.hash, "_thumb.gif")
     )
+    upload_result = original_upload.result()
+    for result in (upload_result, thumb_upload_result):
+        if result.existed:
+            print(f"Already stored {result.uri}")
+        else:
+            print(f"Uploaded {result.uri} ({result.size} bytes)",
+                  f"in {result.secs:.3f}s")
+    s3_uri = upload_result.uri
+    s3_thumb_uri = thumb_upload_result.uri
 
     # remove temporary files
     os.remove(file_path)
@@ -327,7 +561,8 @@ def create_album(
         played_at_dt
     )
 
-    return json_response(serialize_album(db_album, user_info))
+    # (nobody has bookmarked the album just created)
+    return json_response(serialize_album(db_album, False))
 
 
 class CreateTempAlbumReqParams(BaseModel):
@@ -365,45 +600,161 @@ def create_temp_album(
     with open(temp_file_path, "wb") as f:
         f.write(raw_data)
 
-    # load file contents
-    gif = GifManager(temp_file_path)
-    if len(gif.images) <= 1:
-        print("Received too short data as GIF:", len(gif.images))
-        # remove temporary file
-        os.remove(temp_file_path)
+    return json_response(register_temp_album(
+        db, uuid_str, temp_file_path, hash_str, invalid_data_exception
+    ))
 
-        raise invalid_data_exception
-    
-    # call Google Vision API annotations
-    ocr_results = annotate_images(gif.images)
+
+def register_temp_album(
+    db: Session, uuid_str: str, temp_file_path: str, hash_str: str,
+    invalid_data_exception: HTTPException
+) -> Dict:
+    # the same file was OCR'd before: skip loading and OCR entirely
+    # (it has passed the validation below at that time)
+    page_meta_data = crud.get_cached_ocr_result(
+        db, hash_str, get_ocr_backend_name()
+    )
+    if page_meta_data is not None:
+        page_count = len(page_meta_data)
+    else:
+        # load file contents
+        try:
+            gif = GifManager(temp_file_path)
+        except UnidentifiedImageError:
+            print("Received data is not an image")
+            # remove temporary file
+            os.remove(temp_file_path)
+
+            raise invalid_data_exception
+        if gif.n_frames <= 1:
+            print("Received too short data as GIF:", gif.n_frames)
+            # remove temporary file
+            os.remove(temp_file_path)
+
+            raise invalid_data_exception
+        page_count = gif.n_frames
     
     # check if any album with the same hash value exist
     # (just check, no exception here)
     db_album = crud.get_album_by_hash(db, hash_str)
     
     # save temp_album data
+    # (OCR job is queued with it unless results are known;
+    # poll GET /albums/temp/{uuid} for results)
     crud.create_temp_album(
         db,
         schemas.TempAlbumWrite(
             uuid=uuid_str,
-            page_count=len(gif.images),
+            page_count=page_count,
             hash=hash_str
-        )
+        ),
+        page_meta_data
     )
 
     # all green
-    return json_response({
+    return {
         "temporaryAlbumUuid": uuid_str,
         "hashMatchResult": db_album.id if db_album is not None else None,
-        "pageMetaData": [
-            {
-                "description": ocr_result.description,
-                "playerName": ocr_result.player_name,
-            } for ocr_result in ocr_results
-        ],
+        "ocrStatus": models.OCR_JOB_STATUS_QUEUED \
+                        if page_meta_data is None \
+                        else models.OCR_JOB_STATUS_DONE,
+        "pageMetaData": page_meta_data,
+    }
+
+
+@router.get("/albums/temp/{temporary_album_uuid}")
+async def read_temp_album_ocr(
+    user_info: UserInfo,
+    temporary_album_uuid: str,
+    db: AsyncSession = Depends(get_async_db)
+):
+    # status of the OCR job queued by POST /albums/temp
+    # (pageMetaData is filled once ocrStatus becomes "done")
+    db_ocr_job = await crud_async.get_ocr_job(db, temporary_album_uuid)
+    if db_ocr_job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Specified temporaryAlbumUuid does not exist."
+        )
+
+    return json_response({
+        "temporaryAlbumUuid": temporary_album_uuid,
+        "ocrStatus": db_ocr_job.status,
+        "pageMetaData": db_ocr_job.page_meta_data,
     })
 
 
+@router.post("/albums/temp/upload")
+async def upload_temp_album(
+    user_info: UserInfo,
+    request: Request,
+    db: Session = Depends(get_db)
+):
+    # accepts the GIF file either as the raw request body or as the
+    # first file of a multipart form, and writes it to the temporary file
+    # chunk by chunk while hashing
+    invalid_data_exception = HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Given data cannot be interpreted as a GIF file.",
+    )
+    too_large_exception = HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail="Given data is too large.",
+    )
+
+    # bodies declared larger than allowed are rejected before reading
+    content_type = request.headers.get("content-type", "")
+    is_multipart = content_type.startswith("multipart/form-data")
+    max_body_bytes = TEMP_ALBUM_MAX_BYTES
+    if is_multipart:
+        max_body_bytes += TEMP_ALBUM_MAX_FORM_OVERHEAD_BYTES
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > max_body_bytes:
+        raise too_large_exception
+
+    # generate uuid for this data
+    uuid_str = str(uuid.uuid4())
+
+    os.makedirs(TEMP_DIR_NAME, exist_ok=True)
+    temp_file_path = get_gif_path(uuid_str)
+
+    if is_multipart:
+        chunks = iter_first_file(content_type, request.stream())
+    else:
+        chunks = request.stream()
+    hasher = hashlib.sha256()
+    size = 0
+    registered = False
+    try:
+        try:
+            with open(temp_file_path, "wb") as f:
+                async for chunk in chunks:
+                    size += len(chunk)
+                    if size > TEMP_ALBUM_MAX_BYTES:
+                        raise too_large_exception
+                    hasher.update(chunk)
+                    await run_in_threadpool(f.write, chunk)
+        except ValueError:
+            # malformed multipart body
+            raise invalid_data_exception
+        if size == 0:
+            raise invalid_data_exception
+
+        temp_album = await run_in_threadpool(
+            register_temp_album,
+            db, uuid_str, temp_file_path, hasher.hexdigest(),
+            invalid_data_exception
+        )
+        registered = True
+    finally:
+        # remove the file unless a temp_album refers to it, whatever went
+        # wrong (including the client disconnecting mid-stream)
+        if not registered and os.path.exists(temp_file_path):
+            os.remove(temp_file_path)
+
+    return json_response(temp_album)
+
+
 class UpdateAlbumReqParams(BaseModel):
     gamemode_id: int
     tag_ids: List[int]
@@ -461,7 +812,9 @@ def update_album(
         params.tag_ids, params.page_meta_data
     )
 
-    return json_response(serialize_album(db_album, user_info))
+    return json_response(serialize_album(
+        db_album, is_bookmarked_by(db, user_info, db_album.id)
+    ))
 
 
 @router.delete("/albums/{album_id}")
@@ -500,4 +853,6 @@ def increment_album_dlcount(
     # increment dl_count
     db_album = crud.increment_album_dlcount(db, album_id)
 
-    return json_response(serialize_album(db_album, user_info))
+    return json_response(serialize_album(
+        db_album, is_bookmarked_by(db, user_info, db_album.id)
+    ))
@@ -0,0 +1,95 @@
+import datetime
+import hashlib
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, Union
+
+from fastapi import Request, status
+from fastapi.responses import Response
+
+from sql_interface import models
+
+
+# browsers revalidate every time, and shared caches never store responses
+# (they depend on the user)
+CONDITIONAL_CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts: Any) -> str:
+    # strong ETag over everything the response body depends on
+    return '"' + hashlib.sha256(repr(parts).encode()).hexdigest()[:32] + '"'
+
+
+def opaque_tag(etag: str) -> str:
+    # ETag without the weakness indicator
+    # (not str.removeprefix, which Python 3.8 lacks)
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+def etag_matches(header: Union[str, None], etag: str) -> bool:
+    # If-None-Match / If-Range; weak comparison
+    if header is None:
+        return False
+    tags = [opaque_tag(tag.strip()) for tag in header.split(",")]
+    return "*" in tags or opaque_tag(etag) in tags
+
+
+def if_range_matches(header: Union[str, None], etag: str) -> bool:
+    # whether Range applies: without If-Range, or when it equals etag by
+    # strong comparison (weak tags and dates never match)
+    if header is None:
+        return True
+    header = header.strip()
+    return not header.startswith("W/") and not etag.startswith("W/") \
+        and header == etag
+
+
+def http_date(dt: datetime.datetime) -> str:
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=datetime.timezone.utc)
+    return format_datetime(dt.astimezone(datetime.timezone.utc), usegmt=True)
+
+
+def validator_headers(
+    etag: str, last_modified: Union[datetime.datetime, None]
+) -> Dict[str, str]:
+    headers = {"ETag": etag, "Cache-Control": CONDITIONAL_CACHE_CONTROL}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+
+def collection_validator_headers(
+    collection_version: Union[models.CollectionVersion, None], *parts: Any
+) -> Dict[str, str]:
+    # for reads of a whole collection; parts are what else the response
+    # depends on (user, query string)
+    # ({} when the version row does not exist; responses are not validated)
+    if collection_version is None:
+        return {}
+    return validator_headers(
+        make_etag(
+            collection_version.name, collection_version.version, *parts
+        ),
+        collection_version.updated_at
+    )
+
+
+def is_not_modified(request: Request, headers: Dict[str, str]) -> bool:
+    # headers are validator_headers of the current representation
+    # (If-None-Match takes precedence over If-Modified-Since)
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match is not None:
+        return "ETag" in headers \
+            and etag_matches(if_none_match, headers["ETag"])
+    if_modified_since = request.headers.get("If-Modified-Since")
+    if if_modified_since is None or "Last-Modified" not in headers:
+        return False
+    try:
+        return parsedate_to_datetime(headers["Last-Modified"]) \
+            <= parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+
+
+def not_modified_response(headers: Dict[str, str]) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
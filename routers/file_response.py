@@ -0,0 +1,90 @@
+import os
+from typing import BinaryIO, Dict, Iterator, Tuple, Union
+
+from fastapi import Request, status
+from fastapi.responses import Response, StreamingResponse
+
+from routers.conditional import etag_matches, if_range_matches
+from storage.stream import STREAM_CHUNK_SIZE
+
+
+def parse_range(header: str, size: int) -> Union[Tuple[int, int], None]:
+    # first and last byte of a single range "bytes=a-b", "a-" or "-n";
+    # None for ranges to be ignored (malformed or multiple ranges)
+    # and ValueError for unsatisfiable ones
+    unit, _, spec = header.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    if sep == "" or not (first + last).isdigit():
+        return None
+    if first == "":
+        # suffix range: last n bytes
+        if int(last) == 0:
+            raise ValueError()
+        return max(size - int(last), 0), size - 1
+    if int(first) >= size:
+        raise ValueError()
+    if last == "":
+        return int(first), size - 1
+    if int(last) < int(first):
+        return None
+    return int(first), min(int(last), size - 1)
+
+
+def iter_file(f: BinaryIO, start: int, length: int) -> Iterator[bytes]:
+    try:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(STREAM_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        f.close()
+
+
+def file_response(
+    request: Request, f: BinaryIO, etag: str, media_type: str,
+    headers: Dict[str, str] = {}
+) -> Response:
+    # streams an opened file answering Range, If-Range and If-None-Match
+    # (f is closed when the response is done)
+    size = os.fstat(f.fileno()).st_size
+    headers = {**headers, "ETag": etag, "Accept-Ranges": "bytes"}
+
+    if etag_matches(request.headers.get("If-None-Match"), etag):
+        f.close()
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers=headers
+        )
+
+    byte_range = None
+    range_header = request.headers.get("Range")
+    if range_header is not None \
+            and if_range_matches(request.headers.get("If-Range"), etag):
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            f.close()
+            headers["Content-Range"] = f"bytes */{size}"
+            return Response(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                headers=headers
+            )
+
+    if byte_range is None:
+        start, end = 0, size - 1
+        status_code = status.HTTP_200_OK
+    else:
+        start, end = byte_range
+        status_code = status.HTTP_206_PARTIAL_CONTENT
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        iter_file(f, start, end - start + 1),
+        status_code=status_code,
+        headers=headers,
+        media_type=media_type
+    )
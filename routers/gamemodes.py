@@ -1,26 +1,41 @@
-from fastapi import Depends, APIRouter, HTTPException, status
+from fastapi import Depends, APIRouter, HTTPException, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from pydantic.alias_generators import to_camel
 
 from auth.auth import UserInfo
+from routers.conditional import (
+    collection_validator_headers, is_not_modified, not_modified_response
+)
 from routers.json_response import json_response
-from sql_interface import crud
-from sql_interface.database import get_db
+from sql_interface import crud, crud_async, models
+from sql_interface.database import get_async_db, get_db
 
 
 router = APIRouter()
 
 
 @router.get("/gamemodes")
-def read_gamemodes(
+async def read_gamemodes(
     user_info: UserInfo,
+    request: Request,
     partialName: str = "",
     offset: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    get_gamemode_result = crud.get_gamemodes(db, partialName, offset, limit)
+    # unchanged since the client fetched it: skip querying gamemodes
+    headers = collection_validator_headers(
+        await crud_async.get_collection_version(
+            db, models.COLLECTION_GAMEMODES
+        ),
+        str(request.url.query)
+    )
+    if is_not_modified(request, headers):
+        return not_modified_response(headers)
+
+    get_gamemode_result = await crud_async.get_gamemodes(db, partialName, offset, limit)
 
     gamemodes = []
     for db_gamemode in get_gamemode_result.gamemodes:
@@ -32,7 +47,7 @@ def read_gamemodes(
     return json_response({
         "gamemodesCountAll": get_gamemode_result.gamemodes_count,
         "gamemodes": gamemodes,
-    })
+    }, headers=headers)
 
 
 class CreateGamemodeReqParams(BaseModel):
@@ -1,4 +1,5 @@
 import datetime
+from typing import Dict, Union
 
 from fastapi import status
 from fastapi.encoders import jsonable_encoder
@@ -10,7 +11,8 @@ def dt_encoder(dt: datetime.datetime) -> str:
 
 
 def json_response(
-    obj: dict, status_code: int = status.HTTP_200_OK
+    obj: dict, status_code: int = status.HTTP_200_OK,
+    headers: Union[Dict[str, str], None] = None
 ) -> JSONResponse:
     return JSONResponse(
         content=jsonable_encoder(
@@ -19,5 +21,6 @@ def json_response(
                 datetime.datetime: dt_encoder
             }
         ),
-        status_code=status_code
+        status_code=status_code,
+        headers=headers
     )
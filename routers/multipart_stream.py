@@ -0,0 +1,84 @@
+from typing import AsyncIterator, List
+
+import multipart
+from multipart.multipart import parse_options_header
+
+
+class FirstFilePart:
+    # callbacks of multipart.MultipartParser collecting the data of the
+    # first part with a filename; other parts are skipped
+    chunks: List[bytes]
+    started: bool
+    done: bool
+
+    def __init__(self) -> None:
+        self.chunks = []
+        self.started = False
+        self.done = False
+        self.in_file = False
+        self.header_field = b""
+        self.header_value = b""
+        self.disposition = b""
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+        }
+
+    def on_part_begin(self) -> None:
+        self.disposition = b""
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self.header_field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self.header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        if self.header_field.lower() == b"content-disposition":
+            self.disposition = self.header_value
+        self.header_field = b""
+        self.header_value = b""
+
+    def on_headers_finished(self) -> None:
+        _, options = parse_options_header(self.disposition)
+        self.in_file = not self.done and b"filename" in options
+        self.started = self.started or self.in_file
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self.in_file:
+            self.chunks.append(data[start:end])
+
+    def on_part_end(self) -> None:
+        if self.in_file:
+            self.in_file = False
+            self.done = True
+
+
+async def iter_first_file(
+    content_type: str, stream: AsyncIterator[bytes]
+) -> AsyncIterator[bytes]:
+    # contents of the first file of a multipart/form-data body, parsed as
+    # the body arrives instead of spooling it like Request.form()
+    # (reading stops at the end of that file; ValueError for malformed
+    # bodies, and nothing is yielded when there is no file)
+    _, params = parse_options_header(content_type)
+    if b"boundary" not in params:
+        raise ValueError("Missing boundary in multipart.")
+    part = FirstFilePart()
+    parser = multipart.MultipartParser(params[b"boundary"], part.callbacks())
+    async for chunk in stream:
+        parser.write(chunk)
+        for data in part.chunks:
+            yield data
+        part.chunks.clear()
+        if part.done:
+            return
+    if part.started:
+        raise ValueError("Incomplete multipart body.")
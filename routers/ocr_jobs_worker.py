@@ -0,0 +1,146 @@
+import os
+import multiprocessing
+import threading
+import time
+from typing import List
+
+from ocr.backends import OCRBackend, get_ocr_backend
+from ocr.gif import GifManager
+from routers.albums import get_gif_path
+from sql_interface import crud
+from sql_interface.database import SessionLocal, engine
+from sql_interface.frame_ocr_cache import frame_ocr_cache
+
+
+OCR_JOB_POLL_INTERVAL_SECS = 1
+# running jobs are touched this often by their worker, and taken over by
+# another worker when not touched for OCR_JOB_STALE_SECS (the worker died)
+OCR_JOB_HEARTBEAT_SECS = 30
+OCR_JOB_STALE_SECS = 2 * 60 # 2 minutes
+OCR_JOB_MAX_ATTEMPTS = 3
+
+
+class OcrJobsWorker:
+    procs: List[multiprocessing.Process]
+    n_threads: int
+
+    def __init__(self):
+        self.procs = []
+        self.n_threads = 1
+
+    def start(self, n_procs: int):
+        # called after .env is loaded (not at import)
+        # jobs processed at once in each process
+        self.n_threads = int(os.environ.get("OCR_JOB_THREADS", "1"))
+        for _ in range(n_procs):
+            proc = multiprocessing.Process(target=self.run, args=())
+            proc.start()
+            self.procs.append(proc)
+
+    def heartbeat(self, ocr_job_id: int, stop_event: threading.Event):
+        # keeps the running job from looking stale however long it takes
+        while not stop_event.wait(OCR_JOB_HEARTBEAT_SECS):
+            db = SessionLocal()
+            try:
+                crud.touch_ocr_job(db, ocr_job_id)
+            except Exception as e:
+                print("Failed to touch OCR job:", ocr_job_id, e)
+            finally:
+                db.close()
+
+    def process_ocr_job(self, backend: OCRBackend) -> bool:
+        # returns False if there was no job to process
+        db = SessionLocal()
+        try:
+            db_ocr_job = crud.claim_ocr_job(
+                db, OCR_JOB_STALE_SECS, OCR_JOB_MAX_ATTEMPTS
+            )
+            if db_ocr_job is None:
+                return False
+
+            stop_heartbeat = threading.Event()
+            heartbeat = threading.Thread(
+                target=self.heartbeat,
+                args=(db_ocr_job.id, stop_heartbeat),
+                daemon=True
+            )
+            heartbeat.start()
+            try:
+                gif = GifManager(get_gif_path(db_ocr_job.temp_album_uuid))
+                if backend.persistent:
+                    # only frames not OCR'd before are sent to the backend
+                    # (frames are decoded once to hash and again to send)
+                    ocr_results, answered_by = frame_ocr_cache.annotate(
+                        gif, backend
+                    )
+                else:
+                    ocr_results, answered_by = backend.annotate_images_by(gif)
+            except Exception as e:
+                print("OCR job failed:", db_ocr_job.temp_album_uuid, e)
+                crud.fail_ocr_job(
+                    db, db_ocr_job.id, repr(e), OCR_JOB_MAX_ATTEMPTS
+                )
+                return True
+            finally:
+                stop_heartbeat.set()
+                heartbeat.join()
+
+            # results of the file are kept only when all of them are of
+            # the configured backend (not of its fallback)
+            keep_result = answered_by.persistent \
+                and answered_by.name == backend.name
+            crud.complete_ocr_job(db, db_ocr_job.id, [
+                {
+                    "description": ocr_result.description,
+                    "playerName": ocr_result.player_name,
+                } for ocr_result in ocr_results
+            ], backend.name if keep_result else None)
+            print("Frame OCR cache:", frame_ocr_cache.stats)
+            return True
+        finally:
+            db.close()
+
+    def run(self):
+        # connections inherited from the parent process must not be shared
+        engine.dispose(close=False)
+
+        # (see ocr.backends.get_ocr_backend for configuration)
+        backend = get_ocr_backend()
+        threads = [
+            threading.Thread(target=self.run_jobs, args=(backend,))
+            for _ in range(self.n_threads)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def run_jobs(self, backend: OCRBackend):
+        while True:
+            try:
+                processed = self.process_ocr_job(backend)
+            except Exception as e:
+                print("Failed to process OCR job:", e)
+                processed = False
+            if not processed:
+                time.sleep(OCR_JOB_POLL_INTERVAL_SECS)
+
+    def stop(self):
+        # jobs left running are taken over by other workers once stale
+        for proc in self.procs:
+            proc.terminate()
+        for proc in self.procs:
+            proc.join()
+        self.procs = []
+
+
+if __name__ == "__main__":
+    # run workers apart from the API server:
+    # OCR_JOB_WORKERS=4 OCR_JOB_THREADS=4 python -m routers.ocr_jobs_worker
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    worker = OcrJobsWorker()
+    worker.start(int(os.environ.get("OCR_JOB_WORKERS", "1")))
+    for proc in worker.procs:
+        proc.join()
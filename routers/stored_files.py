@@ -0,0 +1,35 @@
+import mimetypes
+
+from fastapi import APIRouter, HTTPException, Request, status
+
+from routers.file_response import file_response
+from storage.backend import IMMUTABLE_CACHE_CONTROL, get_storage_backend
+from storage.local import LocalStorageBackend
+
+
+router = APIRouter()
+
+
+@router.get("/storage/{key:path}")
+def read_stored_file(key: str, request: Request):
+    # serves objects of the local storage backend
+    # (public like S3 objects; URLs come from source/thumbSource of albums)
+    not_found_exception = HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail="Specified file does not exist."
+    )
+    storage = get_storage_backend()
+    if not isinstance(storage, LocalStorageBackend):
+        raise not_found_exception
+    try:
+        f = open(storage.local_path(key), "rb")
+    except (ValueError, FileNotFoundError, IsADirectoryError):
+        raise not_found_exception
+
+    # keys are content addressed, so they can be the ETag as is
+    return file_response(
+        request, f,
+        etag=f'"{key}"',
+        media_type=mimetypes.guess_type(key)[0] or "application/octet-stream",
+        headers={"Cache-Control": IMMUTABLE_CACHE_CONTROL}
+    )
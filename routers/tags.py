@@ -1,26 +1,39 @@
-from fastapi import Depends, APIRouter, HTTPException, status
+from fastapi import Depends, APIRouter, HTTPException, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from pydantic.alias_generators import to_camel
 
 from auth.auth import UserInfo
+from routers.conditional import (
+    collection_validator_headers, is_not_modified, not_modified_response
+)
 from routers.json_response import json_response
-from sql_interface import crud
-from sql_interface.database import get_db
+from sql_interface import crud, crud_async, models
+from sql_interface.database import get_async_db, get_db
 
 
 router = APIRouter()
 
 
 @router.get("/tags")
-def read_tags(
+async def read_tags(
     user_info: UserInfo,
+    request: Request,
     partialName: str = "",
     offset: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    get_tag_result = crud.get_tags(db, partialName, offset, limit)
+    # unchanged since the client fetched it: skip querying tags
+    headers = collection_validator_headers(
+        await crud_async.get_collection_version(db, models.COLLECTION_TAGS),
+        str(request.url.query)
+    )
+    if is_not_modified(request, headers):
+        return not_modified_response(headers)
+
+    get_tag_result = await crud_async.get_tags(db, partialName, offset, limit)
 
     tags = []
     for db_tag in get_tag_result.tags:
@@ -32,7 +45,7 @@ def read_tags(
     return json_response({
         "tagsCountAll": get_tag_result.tags_count,
         "tags": tags,
-    })
+    }, headers=headers)
 
 
 class CreateTagReqParams(BaseModel):
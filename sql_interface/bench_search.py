@@ -0,0 +1,124 @@
+import argparse
+import contextlib
+import datetime
+import os
+import random
+import time
+from typing import Dict, Iterator, List
+
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.orm import Session
+
+from sql_interface import crud, models
+from sql_interface.database import Base
+
+
+BENCH_SCHEMA = "bench_search"
+PAGES_PER_ALBUM = 30
+INSERT_BATCH_SIZE = 10000
+
+# words subtitles are made of; 1-2 character queries hit most albums
+WORDS = [
+    "の", "に", "は", "を", "が", "で", "と", "も", "ね", "よ",
+    "ありがとう", "おはよう", "こんにちは", "さようなら", "すみません",
+    "勇者", "魔王", "宿屋", "武器", "防具", "冒険", "王様", "姫", "村人",
+    "スライム", "ドラゴン", "ポーション", "ゴールド", "レベル", "パーティ",
+]
+
+
+def make_description(rng: random.Random) -> str:
+    return "".join(rng.choice(WORDS) for _ in range(rng.randint(4, 12)))
+
+
+def populate(db: Session, first_album_id: int, n_albums: int) -> None:
+    # albums with ids first_album_id.. and PAGES_PER_ALBUM pages each
+    rng = random.Random(first_album_id)
+    played_at = datetime.datetime(2023, 1, 1, tzinfo=datetime.timezone.utc)
+    albums: List[Dict] = []
+    pages: List[Dict] = []
+    for album_id in range(first_album_id, first_album_id + n_albums):
+        albums.append({
+            "id": album_id,
+            "source": f"{album_id}.gif",
+            "played_at": played_at + datetime.timedelta(minutes=album_id),
+            "pv_count": 0,
+            "download_count": 0,
+            "page_count": PAGES_PER_ALBUM,
+        })
+        for i in range(PAGES_PER_ALBUM):
+            pages.append({
+                "album_id": album_id,
+                "index": i,
+                "description": make_description(rng),
+                "player_name": rng.choice(WORDS[10:]),
+            })
+    db.execute(insert(models.Album), albums)
+    for i in range(0, len(pages), INSERT_BATCH_SIZE):
+        db.execute(insert(models.Page), pages[i:i + INSERT_BATCH_SIZE])
+    db.commit()
+
+
+@contextlib.contextmanager
+def legacy_search() -> Iterator[None]:
+    # every pattern checked by EXISTS and counted in full, as before
+    # trigram indexes were used
+    saved = crud.TRGM_MIN_QUERY_LENGTH, crud.SHORT_PATTERN_COUNT_LIMIT
+    crud.TRGM_MIN_QUERY_LENGTH = 1 << 30
+    crud.SHORT_PATTERN_COUNT_LIMIT = 1 << 62
+    try:
+        yield
+    finally:
+        crud.TRGM_MIN_QUERY_LENGTH, crud.SHORT_PATTERN_COUNT_LIMIT = saved
+
+
+def time_search(db: Session, pattern: str, repeat: int) -> float:
+    start = time.perf_counter()
+    # (no albums version is given, so counts are never cached)
+    for _ in range(repeat):
+        crud.get_albums(
+            db, crud.GET_ALBUMS_ORDER_BY_PAT, crud.GET_ALBUMS_ORDER_DESC,
+            0, 100, pattern, None, None, None, None, None, False, ""
+        )
+    return (time.perf_counter() - start) / repeat
+
+
+if __name__ == "__main__":
+    # python -m sql_interface.bench_search
+    # (DATABASE_URL must point to a scratch PostgreSQL database where
+    # pg_trgm can be enabled; tables are created in a schema of their own
+    # and dropped afterwards)
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-a", "--albums", type=int, nargs="+",
+                    default=[1000, 5000, 20000])
+    ap.add_argument("-q", "--patterns", nargs="+",
+                    default=["の", "勇者", "スライム", "存在しない"])
+    ap.add_argument("-n", "--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    engine = create_engine(
+        os.environ["DATABASE_URL"],
+        connect_args={"options": f"-csearch_path={BENCH_SCHEMA},public"}
+    )
+    with engine.begin() as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {BENCH_SCHEMA}"))
+    Base.metadata.create_all(engine)
+
+    try:
+        with Session(engine) as db:
+            n_albums = 0
+            for target in sorted(args.albums):
+                populate(db, n_albums + 1, target - n_albums)
+                n_albums = target
+                db.execute(text("ANALYZE"))
+                print(f"{n_albums} albums, {n_albums * PAGES_PER_ALBUM} pages")
+                for pattern in args.patterns:
+                    secs = time_search(db, pattern, args.repeat)
+                    with legacy_search():
+                        legacy_secs = time_search(db, pattern, args.repeat)
+                    print(f"  {pattern}: {secs * 1000:.1f}ms "
+                          + f"(legacy {legacy_secs * 1000:.1f}ms)")
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA {BENCH_SCHEMA} CASCADE"))
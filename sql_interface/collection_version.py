@@ -0,0 +1,14 @@
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from . import models
+
+
+def bump_collection_version(db: Session, name: str) -> None:
+    # call before committing the write, so that the new contents are never
+    # seen with the old version
+    db.execute(
+        update(models.CollectionVersion)
+            .where(models.CollectionVersion.name == name)
+            .values(version=models.CollectionVersion.version + 1)
+    )
@@ -0,0 +1,44 @@
+import threading
+from typing import Dict, Hashable, Union
+
+
+ALBUMS_COUNT_CACHE_MAX_ENTRIES = 1024
+
+
+# in-process cache of total counts keyed by the version of the collection
+# and normalized filter sets
+# (a write by any worker process bumps the version, so entries of older
+# versions are never looked up again; writes in this process also call
+# invalidate() to drop them early)
+class CountCache:
+    max_entries: int
+    generation: int
+    entries: Dict[Hashable, int]
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self.generation = 0
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Union[int, None]:
+        with self.lock:
+            return self.entries.get(key)
+
+    def set(self, key: Hashable, count: int, generation: int) -> None:
+        # generation is the one read before counting; skip storing when
+        # invalidate() was called in the meantime
+        with self.lock:
+            if generation != self.generation:
+                return
+            if len(self.entries) >= self.max_entries:
+                self.entries.clear()
+            self.entries[key] = count
+
+    def invalidate(self) -> None:
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
+
+
+albums_count_cache = CountCache(ALBUMS_COUNT_CACHE_MAX_ENTRIES)
@@ -0,0 +1,112 @@
+import os
+import threading
+from typing import Dict, Tuple, Union
+
+from sqlalchemy import case, func, update
+
+from . import models
+from .collection_version import bump_collection_version
+from .database import SessionLocal
+
+
+DEFAULT_ALBUM_COUNTERS_FLUSH_INTERVAL_SECS = 10.0
+
+
+# aggregates pv_count / download_count increments per album in memory and
+# writes them periodically with a single relative UPDATE
+class AlbumCounterBuffer:
+    pv_increments: Dict[int, int]
+    dl_increments: Dict[int, int]
+    thread: Union[threading.Thread, None]
+
+    def __init__(self) -> None:
+        self.pv_increments = {}
+        self.dl_increments = {}
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def add(self, album_id: int, pv: int = 0, dl: int = 0) -> None:
+        with self.lock:
+            if pv:
+                self.pv_increments[album_id] = \
+                    self.pv_increments.get(album_id, 0) + pv
+            if dl:
+                self.dl_increments[album_id] = \
+                    self.dl_increments.get(album_id, 0) + dl
+
+    def pending(self, album_id: int) -> Tuple[int, int]:
+        # increments not yet written to database: (pv, dl)
+        with self.lock:
+            return (
+                self.pv_increments.get(album_id, 0),
+                self.dl_increments.get(album_id, 0),
+            )
+
+    def flush(self) -> None:
+        with self.lock:
+            pv_increments = self.pv_increments
+            dl_increments = self.dl_increments
+            self.pv_increments = {}
+            self.dl_increments = {}
+        if len(pv_increments) == 0 and len(dl_increments) == 0:
+            return
+
+        album_ids = set(pv_increments.keys()) | set(dl_increments.keys())
+        # counts are not edits of the album: keep updated_at (and so
+        # Last-Modified and ETag of the album) as it is
+        values = {models.Album.updated_at: models.Album.updated_at}
+        if len(pv_increments):
+            values[models.Album.pv_count] = \
+                func.coalesce(models.Album.pv_count, 0) \
+                + case(pv_increments, value=models.Album.id, else_=0)
+        if len(dl_increments):
+            values[models.Album.download_count] = \
+                func.coalesce(models.Album.download_count, 0) \
+                + case(dl_increments, value=models.Album.id, else_=0)
+
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(models.Album)
+                    .where(models.Album.id.in_(album_ids))
+                    .values(values)
+            )
+            bump_collection_version(db, models.COLLECTION_ALBUMS)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print("Failed to flush album counters:", e)
+            # put increments back so that they are retried next time
+            for album_id, n in pv_increments.items():
+                self.add(album_id, pv=n)
+            for album_id, n in dl_increments.items():
+                self.add(album_id, dl=n)
+        finally:
+            db.close()
+
+    def run(self, interval_secs: float) -> None:
+        while not self.stop_event.wait(interval_secs):
+            self.flush()
+
+    def start(self) -> None:
+        interval_secs = float(os.environ.get(
+            "ALBUM_COUNTERS_FLUSH_INTERVAL_SECS",
+            DEFAULT_ALBUM_COUNTERS_FLUSH_INTERVAL_SECS
+        ))
+        self.stop_event.clear()
+        self.thread = threading.Thread(
+            target=self.run, args=(interval_secs,), daemon=True
+        )
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        # write out whatever is left
+        self.flush()
+
+
+album_counter_buffer = AlbumCounterBuffer()
@@ -1,11 +1,15 @@
 import datetime
 from dataclasses import dataclass
-from typing import Any, Dict, List, Tuple, Union
+from typing import Any, Dict, List, Set, Tuple, Union
 
-from sqlalchemy import text, func
+from sqlalchemy import Select, and_, or_, select, text, func
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from . import models, schemas
+from .collection_version import bump_collection_version
+from .count_cache import albums_count_cache
+from .counter_buffer import album_counter_buffer
 
 
 def remove_item_with_id(l: List, target_id: Any) -> List:
@@ -81,8 +85,8 @@ def get_album(db: Session, id: int, pv_increment: bool = False):
         ) \
         .first()
     if pv_increment and db_album is not None:
-        db_album.pv_count += 1
-        db.commit()
+        # buffered and written later (see counter_buffer)
+        album_counter_buffer.add(db_album.id, pv=1)
     return db_album
 
 GET_ALBUMS_ORDER_BY_PAT = 0 # order by playedAt
@@ -94,128 +98,307 @@ GET_ALBUMS_ORDER_BY_PGC = 4 # order by pageCount
 GET_ALBUMS_ORDER_ASC = 0 # order ascending
 GET_ALBUMS_ORDER_DESC = 1 # order descending
 
+GET_ALBUMS_COUNT_EXACT = 0 # exact count (cached per filter set)
+GET_ALBUMS_COUNT_ESTIMATED = 1 # planner estimate when not filtered
+
+# pg_trgm indexes can serve LIKE patterns of 3 or more characters only
+TRGM_MIN_QUERY_LENGTH = 3
+
+# total counts of queries with shorter patterns (which no index serves)
+# stop at this many albums and are reported as inexact beyond it
+SHORT_PATTERN_COUNT_LIMIT = 1000
+
+def get_albums_sort_column(order_by: int):
+    if order_by == GET_ALBUMS_ORDER_BY_PAT:
+        return models.Album.played_at
+    elif order_by == GET_ALBUMS_ORDER_BY_PVC:
+        return models.Album.pv_count
+    elif order_by == GET_ALBUMS_ORDER_BY_DLC:
+        return models.Album.download_count
+    elif order_by == GET_ALBUMS_ORDER_BY_BMC:
+        return models.Album.bookmark_count
+    elif order_by == GET_ALBUMS_ORDER_BY_PGC:
+        return models.Album.page_count
+    else:
+        raise ValueError()
+
+# position of an album within the result of get_albums
+# (used for keyset pagination)
+@dataclass
+class GetAlbumsCursor:
+    sort_value: Any
+    played_at: datetime.datetime
+    id: int
+
+@dataclass
+class GetAlbumsRow:
+    album: models.Album
+    num_pages: int
+    num_bookmarks: int
+
 @dataclass
 class GetAlbums:
-    albums: List[models.Album]
+    albums: List[GetAlbumsRow]
     albums_count: int
+    albums_count_exact: bool
+    next_cursor: Union[GetAlbumsCursor, None]
 
-def get_albums(
-    db: Session, order_by: int, order: int,
+def escape_like(s: str) -> str:
+    # escape wildcards for LIKE with escape="/"
+    return s.replace("/", "//").replace("%", "/%").replace("_", "/_")
+
+def album_substring_filter(
+    partial: str, column: Any, relation: Any, album_ids_query: Select
+):
+    condition = column.like("%" + escape_like(partial) + "%", escape="/")
+    if len(partial) >= TRGM_MIN_QUERY_LENGTH:
+        # collect ids of matching albums through the trigram index first
+        return models.Album.id.in_(album_ids_query.where(condition))
+    # short patterns have no trigram to look up and tend to match many
+    # rows; check albums one by one in sort order so that LIMIT stops
+    # the scan early
+    return relation.any(condition)
+
+# row estimate kept by ANALYZE (soft-deleted albums included)
+ESTIMATE_ALBUMS_COUNT_SQL = text(
+    "SELECT reltuples FROM pg_class WHERE oid = 'album'::regclass"
+)
+
+def to_albums_count_estimate(reltuples: Any) -> Union[int, None]:
+    # None if the table has never been analyzed
+    if reltuples is None or reltuples < 0:
+        return None
+    return int(reltuples)
+
+def estimate_albums_count(db: Session) -> Union[int, None]:
+    return to_albums_count_estimate(
+        db.execute(ESTIMATE_ALBUMS_COUNT_SQL).scalar()
+    )
+
+# statements for get_albums, shared with its async variant
+@dataclass
+class GetAlbumsQuery:
+    count_key: Tuple
+    # key of total counts in albums_count_cache (None: not cached)
+    count_cache_key: Union[Tuple, None]
+    count_statement: Select
+    # count_statement stops after more than this many albums
+    count_limit: Union[int, None]
+    albums_statement: Select
+    sort_column: Any
+    limit: int
+
+    def is_unfiltered(self) -> bool:
+        return all(v is None for v in self.count_key)
+
+    def to_total_count(self, count: int) -> Tuple[int, bool]:
+        # total count and whether it is exact, from count_statement
+        if self.count_limit is not None and count > self.count_limit:
+            return self.count_limit, False
+        return count, True
+
+def build_get_albums_query(
+    order_by: int, order: int,
     offset: int, limit: int,
     partial_desc: Union[str, None], partial_pname: Union[str, None],
     played_from: Union[int, None],
     played_until: Union[int, None],
     gamemode_id: Union[int, None], partial_tag: Union[str, None],
-    my_bookmark: bool, user_id: str
-):
-    # collect number of pages and bookmarks by subqueries
-    subq_1 = (db.query(
-        models.Album.id.label("album_id_np"),
-        func.count(models.Page.id).label("num_pages")
-    ) \
-        .outerjoin(models.Page) \
-        .group_by("album_id_np")) \
-        .subquery("subq_1")
-    
-    subq_2 = (db.query(
-        models.Album.id.label("album_id_nb"),
-        func.count(models.bookmark_table.c.user_id).label("num_bookmarks")
-    ) \
-        .outerjoin(models.bookmark_table) \
-        .group_by("album_id_nb")) \
-        .subquery("subq_2")
-
-    query = db.query(
-        models.Album,
-        subq_1.c.num_pages,
-        subq_2.c.num_bookmarks,
-    ) \
-        .join(subq_1, models.Album.id == subq_1.c.album_id_np) \
-        .join(subq_2, models.Album.id == subq_2.c.album_id_nb) \
-        .group_by(models.Album, subq_1.c.num_pages, subq_2.c.num_bookmarks) \
-        .filter(models.Album.deleted_at == None)
+    my_bookmark: bool, user_id: str,
+    cursor: Union[GetAlbumsCursor, None] = None,
+    albums_version: Union[int, None] = None
+) -> GetAlbumsQuery:
+    # normalized filter set; cached counts are keyed by it together with
+    # the version of the albums collection, which every write bumps
+    # (counts are not cached when the version is unknown)
+    count_key = (
+        partial_desc, partial_pname, played_from, played_until,
+        gamemode_id, partial_tag, user_id if my_bookmark else None
+    )
+    count_cache_key = (albums_version, count_key) \
+        if albums_version is not None else None
+
+    # number of pages and bookmarks are kept on album itself
+    # (see create_album, add_bookmarks and remove_bookmarks)
+    statement = select(models.Album) \
+        .where(models.Album.deleted_at == None)
     
     # conduct filters
     if partial_desc is not None:
-        partial_desc = partial_desc.replace("%", "/%")
-        query = query.filter(
-            models.Album.pages.any(
-                models.Page.description.like("%" + partial_desc + "%",
-                                             escape="/")
-            )
-        )
+        statement = statement.where(album_substring_filter(
+            partial_desc,
+            models.Page.description,
+            models.Album.pages,
+            select(models.Page.album_id)
+        ))
     if partial_pname is not None:
-        partial_pname = partial_pname.replace("%", "/%")
-        query = query.filter(
-            models.Album.pages.any(
-                models.Page.player_name.like("%" + partial_pname + "%")
-            )
-        )
+        statement = statement.where(album_substring_filter(
+            partial_pname,
+            models.Page.player_name,
+            models.Album.pages,
+            select(models.Page.album_id)
+        ))
     if played_from is not None:
-        query = query.filter(
+        statement = statement.where(
             models.Album.played_at \
                 >= datetime.datetime.fromtimestamp(played_from).astimezone(),
         )
     if played_until is not None:
-        query = query.filter(
+        statement = statement.where(
             models.Album.played_at \
                 <= datetime.datetime.fromtimestamp(played_until).astimezone(),
         )
     if gamemode_id is not None:
-        query = query.filter(models.Album.gamemode_id == gamemode_id)
+        statement = statement.where(models.Album.gamemode_id == gamemode_id)
     if partial_tag is not None:
-        partial_tag = partial_tag.replace("%", "/%")
-        query = query.filter(
-            models.Album.tags.any(
-                models.Tag.name.like("%" + partial_tag + "%")
-            )
-        )
+        statement = statement.where(album_substring_filter(
+            partial_tag,
+            models.Tag.name,
+            models.Album.tags,
+            select(models.album_tag_table.c.album_id).join(models.Tag)
+        ))
     if my_bookmark:
-        query = query.filter(
+        statement = statement.where(
             models.Album.bookmark_users.any(
                 models.User.id == user_id
             )
         )
     
-    # store total counts
-    total_count = query.count()
-
-    # order by
-    if order_by == GET_ALBUMS_ORDER_BY_PAT:
-        if order == GET_ALBUMS_ORDER_ASC:
-            query = query.order_by(models.Album.played_at.asc())
-    elif order_by == GET_ALBUMS_ORDER_BY_PVC:
-        if order == GET_ALBUMS_ORDER_ASC:
-            query = query.order_by(models.Album.pv_count.asc())
+    # total counts
+    # (bounded for short patterns, which are checked album by album)
+    count_limit = None
+    count_subquery = statement
+    if any(
+        partial is not None and len(partial) < TRGM_MIN_QUERY_LENGTH
+        for partial in (partial_desc, partial_pname, partial_tag)
+    ):
+        count_limit = SHORT_PATTERN_COUNT_LIMIT
+        count_subquery = statement.limit(count_limit + 1)
+    count_statement = select(func.count()) \
+        .select_from(count_subquery.subquery())
+
+    # order by the sort column, sub ordered by played_at and then by id
+    # so that every album has a unique position
+    sort_column = get_albums_sort_column(order_by)
+    order_keys: List[Tuple[Any, int]] = [(sort_column, order)]
+    if order_by != GET_ALBUMS_ORDER_BY_PAT:
+        order_keys.append((models.Album.played_at, GET_ALBUMS_ORDER_DESC))
+    order_keys.append((models.Album.id, GET_ALBUMS_ORDER_DESC))
+    for column, direction in order_keys:
+        if direction == GET_ALBUMS_ORDER_ASC:
+            statement = statement.order_by(column.asc())
         else:
-            query = query.order_by(models.Album.pv_count.desc())
-    elif order_by == GET_ALBUMS_ORDER_BY_DLC:
+            statement = statement.order_by(column.desc())
+
+    if cursor is not None:
+        # keyset pagination: take albums positioned after the cursor
+        # (sort columns and played_at are NOT NULL, so every album has
+        # a position)
+        cursor_values = [cursor.sort_value]
+        if order_by != GET_ALBUMS_ORDER_BY_PAT:
+            cursor_values.append(cursor.played_at)
+        cursor_values.append(cursor.id)
+
+        conditions = []
+        for i, (column, direction) in enumerate(order_keys):
+            if direction == GET_ALBUMS_ORDER_ASC:
+                after = column > cursor_values[i]
+            else:
+                after = column < cursor_values[i]
+            conditions.append(and_(
+                *[
+                    prev_column == prev_value
+                    for (prev_column, _), prev_value
+                        in zip(order_keys[:i], cursor_values[:i])
+                ],
+                after
+            ))
+        # redundant range on the sort column lets an index scan start
+        # at the cursor position
         if order == GET_ALBUMS_ORDER_ASC:
-            query = query.order_by(models.Album.download_count.asc())
+            statement = statement.where(sort_column >= cursor.sort_value)
         else:
-            query = query.order_by(models.Album.download_count.desc())
-    elif order_by == GET_ALBUMS_ORDER_BY_BMC:
-        if order == GET_ALBUMS_ORDER_ASC:
-            query = query.order_by(subq_2.c.num_bookmarks.asc())
-        else:
-            query = query.order_by(subq_2.c.num_bookmarks.desc())
-    elif order_by == GET_ALBUMS_ORDER_BY_PGC:
-        if order == GET_ALBUMS_ORDER_ASC:
-            query = query.order_by(subq_1.c.num_pages.asc())
-        else:
-            query = query.order_by(subq_1.c.num_pages.desc())
-    
-    # sub order
-    query = query.order_by(models.Album.played_at.desc())
+            statement = statement.where(sort_column <= cursor.sort_value)
+        statement = statement.where(or_(*conditions))
+    else:
+        statement = statement.offset(offset)
+
+    return GetAlbumsQuery(
+        count_key,
+        count_cache_key,
+        count_statement,
+        count_limit,
+        statement.limit(limit),
+        sort_column,
+        limit
+    )
 
-    db_albums = query \
-        .offset(offset) \
-        .limit(limit) \
-        .all()
+def make_get_albums_result(
+    query: GetAlbumsQuery, db_albums: List[models.Album],
+    total_count: int, total_count_exact: bool
+) -> GetAlbums:
+    # cursor for the next page is available only when this page is full
+    next_cursor = None
+    if len(db_albums) > 0 and len(db_albums) == query.limit:
+        last_album = db_albums[-1]
+        next_cursor = GetAlbumsCursor(
+            getattr(last_album, query.sort_column.key),
+            last_album.played_at,
+            last_album.id
+        )
 
     return GetAlbums(
-        [a.tuple()[0] for a in db_albums],
-        total_count
+        [
+            GetAlbumsRow(a, a.page_count, a.bookmark_count)
+            for a in db_albums
+        ],
+        total_count,
+        total_count_exact,
+        next_cursor
+    )
+
+def get_albums(
+    db: Session, order_by: int, order: int,
+    offset: int, limit: int,
+    partial_desc: Union[str, None], partial_pname: Union[str, None],
+    played_from: Union[int, None],
+    played_until: Union[int, None],
+    gamemode_id: Union[int, None], partial_tag: Union[str, None],
+    my_bookmark: bool, user_id: str,
+    cursor: Union[GetAlbumsCursor, None] = None,
+    count_mode: int = GET_ALBUMS_COUNT_EXACT,
+    albums_version: Union[int, None] = None
+):
+    query = build_get_albums_query(
+        order_by, order, offset, limit,
+        partial_desc, partial_pname, played_from, played_until,
+        gamemode_id, partial_tag, my_bookmark, user_id, cursor,
+        albums_version
+    )
+
+    # store total counts
+    total_count_exact = True
+    total_count = None
+    if query.count_cache_key is not None:
+        total_count = albums_count_cache.get(query.count_cache_key)
+    if total_count is None and count_mode == GET_ALBUMS_COUNT_ESTIMATED \
+            and query.is_unfiltered():
+        total_count = estimate_albums_count(db)
+        total_count_exact = total_count is None
+    if total_count is None:
+        count_generation = albums_count_cache.generation
+        total_count = db.execute(query.count_statement).scalar_one()
+        if query.count_cache_key is not None:
+            albums_count_cache.set(
+                query.count_cache_key, total_count, count_generation
+            )
+    if total_count_exact:
+        total_count, total_count_exact = query.to_total_count(total_count)
+
+    db_albums = db.execute(query.albums_statement).scalars().all()
+
+    return make_get_albums_result(
+        query, db_albums, total_count, total_count_exact
     )
 
 def get_album_by_hash(db: Session, hash_str: str):
@@ -239,7 +422,8 @@ def create_album(
         hash=hash,
         contributor_user_id=contributor_user_id,
         gamemode_id=gamemode_id,
-        played_at=played_at
+        played_at=played_at,
+        page_count=len(page_meta_data),
     )
     db.add(db_album)
 
@@ -264,7 +448,9 @@ def create_album(
     db_temp_album = get_temp_album(db, temp_uuid)
     db_temp_album.deleted_at = datetime.datetime.now().astimezone()
 
+    bump_collection_version(db, models.COLLECTION_ALBUMS)
     db.commit()
+    albums_count_cache.invalidate()
     db.refresh(db_album)
 
     return db_album
@@ -282,8 +468,11 @@ def update_album(
     
     # update gamemode_id
     db_album.gamemode_id = gamemode_id
+    # tags and pages are other tables; mark the album itself as updated
+    db_album.updated_at = func.now()
     
     # update album-tag relations
+    tag_deleted = False
     already_related_tag_ids: Dict[int, bool] = {}
     for tag in db_album.tags:
         already_related_tag_ids[tag.id] = True
@@ -297,6 +486,7 @@ def update_album(
                 db.query(models.Tag) \
                     .filter(models.Tag.id == db_tag.id) \
                     .delete()
+                tag_deleted = True
     # when specified tags that are not related now
     for tag_id in tag_ids:
         if already_related_tag_ids.get(tag_id):
@@ -317,7 +507,11 @@ def update_album(
         db_page.description = page.description
         db_page.player_name = page.player_name
     
+    bump_collection_version(db, models.COLLECTION_ALBUMS)
+    if tag_deleted:
+        bump_collection_version(db, models.COLLECTION_TAGS)
     db.commit()
+    albums_count_cache.invalidate()
     db.refresh(db_album)
 
     return db_album
@@ -330,7 +524,9 @@ def soft_delete_album(
         .first()
     db_album.deleted_at = datetime.datetime.now().astimezone()
 
+    bump_collection_version(db, models.COLLECTION_ALBUMS)
     db.commit()
+    albums_count_cache.invalidate()
 
 def increment_album_dlcount(
     db: Session, id: int
@@ -338,9 +534,8 @@ def increment_album_dlcount(
     db_album = db.query(models.Album) \
         .filter(models.Album.id == id) \
         .first()
-    db_album.download_count += 1
-
-    db.commit()
+    # buffered and written later (see counter_buffer)
+    album_counter_buffer.add(db_album.id, dl=1)
 
     return db_album
 
@@ -386,6 +581,7 @@ def create_gamemode(db: Session, name: str):
         name=name,
     )
     db.add(db_gamemode)
+    bump_collection_version(db, models.COLLECTION_GAMEMODES)
     db.commit()
     return db_gamemode
 
@@ -393,6 +589,7 @@ def delete_gamemode(db: Session, gamemode_id: int):
     db.query(models.Gamemode) \
         .filter(models.Gamemode.id == gamemode_id) \
         .delete()
+    bump_collection_version(db, models.COLLECTION_GAMEMODES)
     
     db.commit()
 
@@ -438,6 +635,7 @@ def create_tag(db: Session, name: str):
         name=name,
     )
     db.add(db_tag)
+    bump_collection_version(db, models.COLLECTION_TAGS)
     db.commit()
     return db_tag
 
@@ -463,13 +661,26 @@ def get_expired_temp_albums(db: Session, expiration_secs: int):
         ) \
         .all()
 
-def create_temp_album(db: Session, temp_album: schemas.TempAlbumWrite):
+def create_temp_album(
+    db: Session, temp_album: schemas.TempAlbumWrite,
+    page_meta_data: Union[List[Dict], None] = None
+):
     db_temp_album = models.TempAlbum(
         uuid=temp_album.uuid,
         page_count=temp_album.page_count,
         hash=temp_album.hash,
     )
     db.add(db_temp_album)
+    # OCR is queued in the same transaction
+    # (or recorded as done if results are already known)
+    if page_meta_data is None:
+        db.add(models.OcrJob(temp_album_uuid=temp_album.uuid))
+    else:
+        db.add(models.OcrJob(
+            temp_album_uuid=temp_album.uuid,
+            status=models.OCR_JOB_STATUS_DONE,
+            page_meta_data=page_meta_data,
+        ))
     db.commit()
     db.refresh(db_temp_album)
     return db_temp_album
@@ -485,10 +696,176 @@ def soft_delete_temp_album(db: Session, uuid: str):
     db.commit()
 
 
+# ----------------------------------------------------------------
+# ocr_job
+# ----------------------------------------------------------------
+
+def claim_ocr_job(db: Session, stale_secs: int, max_attempts: int):
+    # takes the oldest queued job, or a running one whose worker seems to
+    # have died, and marks it running
+    # (SKIP LOCKED lets concurrent workers claim different jobs without
+    # waiting for each other)
+    stale_bound = datetime.datetime.now().astimezone() \
+                    - datetime.timedelta(seconds=stale_secs)
+    while True:
+        db_ocr_job = db.query(models.OcrJob) \
+            .filter(
+                or_(
+                    models.OcrJob.status == models.OCR_JOB_STATUS_QUEUED,
+                    and_(
+                        models.OcrJob.status
+                            == models.OCR_JOB_STATUS_RUNNING,
+                        models.OcrJob.updated_at <= stale_bound
+                    )
+                )
+            ) \
+            .order_by(models.OcrJob.created_at, models.OcrJob.id) \
+            .with_for_update(skip_locked=True) \
+            .first()
+        if db_ocr_job is None:
+            db.rollback()
+            return None
+
+        if db_ocr_job.attempts >= max_attempts:
+            # worker died on this job every time
+            db_ocr_job.status = models.OCR_JOB_STATUS_FAILED
+            db_ocr_job.error = "Too many attempts."
+            db.commit()
+            continue
+
+        db_ocr_job.status = models.OCR_JOB_STATUS_RUNNING
+        db_ocr_job.attempts += 1
+        db.commit()
+        db.refresh(db_ocr_job)
+        return db_ocr_job
+
+def touch_ocr_job(db: Session, id: int):
+    # heartbeat of a running job, so that claim_ocr_job does not take it
+    # as stale
+    db.query(models.OcrJob) \
+        .filter(
+            models.OcrJob.id == id,
+            models.OcrJob.status == models.OCR_JOB_STATUS_RUNNING
+        ) \
+        .update(
+            {models.OcrJob.updated_at: func.now()},
+            synchronize_session=False
+        )
+    db.commit()
+
+def complete_ocr_job(
+    db: Session, id: int, page_meta_data: List[Dict],
+    backend_name: Union[str, None]
+):
+    # results are kept for uploads of the same file under backend_name
+    # (None: not kept)
+    db_ocr_job = db.query(models.OcrJob) \
+        .filter(models.OcrJob.id == id) \
+        .first()
+    db_ocr_job.status = models.OCR_JOB_STATUS_DONE
+    db_ocr_job.page_meta_data = page_meta_data
+    db_ocr_job.error = None
+    db.commit()
+
+    if backend_name is None:
+        return
+    db_temp_album = db.query(models.TempAlbum) \
+        .filter(models.TempAlbum.uuid == db_ocr_job.temp_album_uuid) \
+        .first()
+    if db_temp_album is not None and db_temp_album.hash is not None:
+        create_ocr_result(
+            db, db_temp_album.hash, backend_name, page_meta_data
+        )
+
+
+# ----------------------------------------------------------------
+# ocr_result
+# ----------------------------------------------------------------
+
+def get_cached_ocr_result(
+    db: Session, hash_str: str, backend_name: str
+) -> Union[List[Dict], None]:
+    # OCR results of a file with the given hash, either stored by an OCR
+    # job of backend_name or taken from pages of the album archived from it
+    db_ocr_result = db.query(models.OcrResult) \
+        .filter(
+            models.OcrResult.hash == hash_str,
+            models.OcrResult.backend == backend_name
+        ) \
+        .first()
+    if db_ocr_result is not None:
+        return db_ocr_result.page_meta_data
+
+    db_album = get_album_by_hash(db, hash_str)
+    if db_album is None:
+        return None
+    return [
+        {
+            "description": page.description,
+            "playerName": page.player_name,
+        } for page in sorted(db_album.pages, key=lambda p: p.index)
+    ]
+
+def create_ocr_result(
+    db: Session, hash_str: str, backend_name: str,
+    page_meta_data: List[Dict]
+):
+    db.add(models.OcrResult(
+        hash=hash_str, backend=backend_name, page_meta_data=page_meta_data
+    ))
+    try:
+        db.commit()
+    except IntegrityError:
+        # stored by another worker in the meantime
+        db.rollback()
+
+def fail_ocr_job(db: Session, id: int, error: str, max_attempts: int):
+    # queue again unless attempts are used up
+    db_ocr_job = db.query(models.OcrJob) \
+        .filter(models.OcrJob.id == id) \
+        .first()
+    if db_ocr_job.attempts < max_attempts:
+        db_ocr_job.status = models.OCR_JOB_STATUS_QUEUED
+    else:
+        db_ocr_job.status = models.OCR_JOB_STATUS_FAILED
+    db_ocr_job.error = error[:1024]
+    db.commit()
+
+
 # ----------------------------------------------------------------
 # bookmark
 # ----------------------------------------------------------------
 
+def get_bookmarked_album_ids(
+    db: Session, user_id: str, album_ids: List[int]
+) -> Set[int]:
+    # which of the given albums are bookmarked by the user
+    if len(album_ids) == 0:
+        return set()
+    rows = db.query(models.bookmark_table.c.album_id) \
+        .filter(
+            models.bookmark_table.c.user_id == user_id,
+            models.bookmark_table.c.album_id.in_(album_ids)
+        ) \
+        .all()
+    return set(row.album_id for row in rows)
+
+def update_album_bookmark_counts(
+    db: Session, album_ids: List[int], delta: int
+):
+    # relative update so that concurrent transactions never lose counts
+    if len(album_ids) == 0:
+        return
+    db.query(models.Album) \
+        .filter(models.Album.id.in_(album_ids)) \
+        .update(
+            {
+                models.Album.bookmark_count: \
+                    models.Album.bookmark_count + delta
+            },
+            synchronize_session=False
+        )
+
 def add_bookmarks(db: Session, user_id: int, album_ids: List[int]):
     db_user = db.query(models.User) \
         .filter(models.User.id == user_id) \
@@ -498,6 +875,7 @@ def add_bookmarks(db: Session, user_id: int, album_ids: List[int]):
     # update user-album relations
     already_bookmarked_album_ids: Dict[int, bool] = {}
     bookmarked_album_ids: List[int] = []
+    added_album_ids: List[int] = []
     for bookmark_album in db_user.bookmark_albums:
         already_bookmarked_album_ids[bookmark_album.id] = True
         bookmarked_album_ids.append(bookmark_album.id)
@@ -512,8 +890,15 @@ def add_bookmarks(db: Session, user_id: int, album_ids: List[int]):
         # add relation
         db_user.bookmark_albums.append(db_album)
         bookmarked_album_ids.append(db_album.id)
+        added_album_ids.append(db_album.id)
+        already_bookmarked_album_ids[db_album.id] = True
     
+    # update album.bookmark_count within the same transaction
+    update_album_bookmark_counts(db, added_album_ids, 1)
+    bump_collection_version(db, models.COLLECTION_ALBUMS)
+
     db.commit()
+    albums_count_cache.invalidate()
     db.refresh(db_user)
     
     return bookmarked_album_ids
@@ -527,6 +912,7 @@ def remove_bookmarks(db: Session, user_id: int, album_ids: List[int]):
     # update user-album relations
     already_bookmarked_album_ids: Dict[int, bool] = {}
     bookmarked_album_ids: List[int] = []
+    removed_album_ids: List[int] = []
     for bookmark_album in db_user.bookmark_albums:
         already_bookmarked_album_ids[bookmark_album.id] = True
         bookmarked_album_ids.append(bookmark_album.id)
@@ -538,8 +924,15 @@ def remove_bookmarks(db: Session, user_id: int, album_ids: List[int]):
             db_user.bookmark_albums, album_id
         )
         bookmarked_album_ids.remove(album_id)
+        removed_album_ids.append(album_id)
+        del already_bookmarked_album_ids[album_id]
     
+    # update album.bookmark_count within the same transaction
+    update_album_bookmark_counts(db, removed_album_ids, -1)
+    bump_collection_version(db, models.COLLECTION_ALBUMS)
+
     db.commit()
+    albums_count_cache.invalidate()
     db.refresh(db_user)
     
     return bookmarked_album_ids
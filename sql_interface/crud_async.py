@@ -0,0 +1,217 @@
+import datetime
+from typing import List, Set, Union
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from . import models
+from .count_cache import albums_count_cache
+from .counter_buffer import album_counter_buffer
+from .crud import (
+    ESTIMATE_ALBUMS_COUNT_SQL, GET_ALBUMS_COUNT_ESTIMATED,
+    GET_ALBUMS_COUNT_EXACT, GetAlbumsCursor, GetGamemodes, GetTags,
+    build_get_albums_query, make_get_albums_result, to_albums_count_estimate,
+)
+
+
+# async variants of the frequently called read functions in crud
+# (relationships can not be lazy loaded in async sessions, so whatever
+# the callers touch is loaded eagerly here)
+
+
+# ----------------------------------------------------------------
+# user
+# ----------------------------------------------------------------
+
+async def get_user(
+    db: AsyncSession, id: str, password: Union[str, None] = None
+):
+    statement = select(models.User) \
+        .where(
+            models.User.id == id,
+            models.User.deleted_at == None
+        )
+    if password is not None:
+        statement = statement.where(models.User.password == password)
+    return (await db.execute(statement.limit(1))).scalars().first()
+
+
+# ----------------------------------------------------------------
+# album
+# ----------------------------------------------------------------
+
+async def get_album(db: AsyncSession, id: int, pv_increment: bool = False):
+    db_album = (await db.execute(
+        select(models.Album)
+            .where(
+                models.Album.id == id,
+                models.Album.deleted_at == None
+            )
+            .options(
+                selectinload(models.Album.tags),
+                selectinload(models.Album.pages),
+            )
+            .limit(1)
+    )).scalars().first()
+    if pv_increment and db_album is not None:
+        # buffered and written later (see counter_buffer)
+        album_counter_buffer.add(db_album.id, pv=1)
+    return db_album
+
+async def get_album_updated_at(
+    db: AsyncSession, id: int
+) -> Union[datetime.datetime, None]:
+    # for conditional requests, before loading the album itself
+    return (await db.execute(
+        select(models.Album.updated_at)
+            .where(
+                models.Album.id == id,
+                models.Album.deleted_at == None
+            )
+            .limit(1)
+    )).scalar()
+
+async def get_albums(
+    db: AsyncSession, order_by: int, order: int,
+    offset: int, limit: int,
+    partial_desc: Union[str, None], partial_pname: Union[str, None],
+    played_from: Union[int, None],
+    played_until: Union[int, None],
+    gamemode_id: Union[int, None], partial_tag: Union[str, None],
+    my_bookmark: bool, user_id: str,
+    cursor: Union[GetAlbumsCursor, None] = None,
+    count_mode: int = GET_ALBUMS_COUNT_EXACT,
+    albums_version: Union[int, None] = None
+):
+    query = build_get_albums_query(
+        order_by, order, offset, limit,
+        partial_desc, partial_pname, played_from, played_until,
+        gamemode_id, partial_tag, my_bookmark, user_id, cursor,
+        albums_version
+    )
+
+    # store total counts
+    total_count_exact = True
+    total_count = None
+    if query.count_cache_key is not None:
+        total_count = albums_count_cache.get(query.count_cache_key)
+    if total_count is None and count_mode == GET_ALBUMS_COUNT_ESTIMATED \
+            and query.is_unfiltered():
+        total_count = to_albums_count_estimate(
+            (await db.execute(ESTIMATE_ALBUMS_COUNT_SQL)).scalar()
+        )
+        total_count_exact = total_count is None
+    if total_count is None:
+        count_generation = albums_count_cache.generation
+        total_count = (await db.execute(query.count_statement)).scalar_one()
+        if query.count_cache_key is not None:
+            albums_count_cache.set(
+                query.count_cache_key, total_count, count_generation
+            )
+    if total_count_exact:
+        total_count, total_count_exact = query.to_total_count(total_count)
+
+    db_albums = (await db.execute(query.albums_statement)).scalars().all()
+
+    return make_get_albums_result(
+        query, db_albums, total_count, total_count_exact
+    )
+
+
+# ----------------------------------------------------------------
+# game_mode
+# ----------------------------------------------------------------
+
+async def get_gamemodes(
+    db: AsyncSession, partial_name: str, offset: int = 0, limit: int = 100
+):
+    statement = select(models.Gamemode)
+    if len(partial_name):
+        statement = statement.where(
+            models.Gamemode.name.like("%" + partial_name + "%")
+        )
+    total_count = (await db.execute(
+        select(func.count()).select_from(statement.subquery())
+    )).scalar_one()
+    return GetGamemodes(
+        (await db.execute(
+            statement.offset(offset).limit(limit)
+        )).scalars().all(),
+        total_count
+    )
+
+
+# ----------------------------------------------------------------
+# tag
+# ----------------------------------------------------------------
+
+async def get_tags(
+    db: AsyncSession, partial_name: str, offset: int = 0, limit: int = 100
+):
+    statement = select(models.Tag)
+    if len(partial_name):
+        statement = statement.where(
+            models.Tag.name.like("%" + partial_name + "%")
+        )
+    total_count = (await db.execute(
+        select(func.count()).select_from(statement.subquery())
+    )).scalar_one()
+    return GetTags(
+        (await db.execute(
+            statement.offset(offset).limit(limit)
+        )).scalars().all(),
+        total_count
+    )
+
+
+# ----------------------------------------------------------------
+# collection_version
+# ----------------------------------------------------------------
+
+async def get_collection_version(db: AsyncSession, name: str):
+    return (await db.execute(
+        select(models.CollectionVersion)
+            .where(models.CollectionVersion.name == name)
+            .limit(1)
+    )).scalars().first()
+
+
+# ----------------------------------------------------------------
+# ocr_job
+# ----------------------------------------------------------------
+
+async def get_ocr_job(db: AsyncSession, temp_album_uuid: str):
+    # (only for temp_albums not yet removed)
+    return (await db.execute(
+        select(models.OcrJob)
+            .join(
+                models.TempAlbum,
+                models.TempAlbum.uuid == models.OcrJob.temp_album_uuid
+            )
+            .where(
+                models.OcrJob.temp_album_uuid == temp_album_uuid,
+                models.TempAlbum.deleted_at == None
+            )
+            .limit(1)
+    )).scalars().first()
+
+
+# ----------------------------------------------------------------
+# bookmark
+# ----------------------------------------------------------------
+
+async def get_bookmarked_album_ids(
+    db: AsyncSession, user_id: str, album_ids: List[int]
+) -> Set[int]:
+    # which of the given albums are bookmarked by the user
+    if len(album_ids) == 0:
+        return set()
+    rows = (await db.execute(
+        select(models.bookmark_table.c.album_id)
+            .where(
+                models.bookmark_table.c.user_id == user_id,
+                models.bookmark_table.c.album_id.in_(album_ids)
+            )
+    )).all()
+    return set(row.album_id for row in rows)
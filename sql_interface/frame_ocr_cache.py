@@ -0,0 +1,181 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
+
+from PIL import Image
+from sqlalchemy.dialects.postgresql import insert
+
+from ocr.backends import OCRBackend
+from ocr.image_annotator import ImageAnnotation, frame_hash
+from . import models
+from .database import SessionLocal
+
+
+FRAME_OCR_CACHE_LRU_MAX_ENTRIES = 4096
+
+
+class FrameOcrCacheStats:
+    frames: int
+    lru_hits: int
+    db_hits: int
+    sent: int
+
+    def __init__(self) -> None:
+        self.frames = 0
+        self.lru_hits = 0
+        self.db_hits = 0
+        self.sent = 0
+
+    def hit_rate(self) -> float:
+        # share of frames not sent to OCR
+        # (includes frames repeated within a GIF)
+        if self.frames == 0:
+            return 0.0
+        return 1 - self.sent / self.frames
+
+    def __str__(self) -> str:
+        return f"frames={self.frames} lru_hits={self.lru_hits} " \
+                + f"db_hits={self.db_hits} sent={self.sent} " \
+                + f"hit_rate={self.hit_rate():.3f}"
+
+
+# per-frame OCR results in frame_ocr_result with a bounded in-memory LRU
+# in front, so that only frames never seen before are sent to OCR
+class FrameOcrCache:
+    max_entries: int
+    entries: "OrderedDict[str, ImageAnnotation]"
+    stats: FrameOcrCacheStats
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.stats = FrameOcrCacheStats()
+        self.lock = threading.Lock()
+
+    def remember(self, key: str, annotation: ImageAnnotation) -> None:
+        with self.lock:
+            self.entries[key] = annotation
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, ImageAnnotation]:
+        result: Dict[str, ImageAnnotation] = {}
+        with self.lock:
+            for key in keys:
+                annotation = self.entries.get(key)
+                if annotation is not None:
+                    self.entries.move_to_end(key)
+                    result[key] = annotation
+            self.stats.lru_hits += len(result)
+
+        db_keys = [key for key in keys if key not in result]
+        if len(db_keys) == 0:
+            return result
+        db = SessionLocal()
+        try:
+            db_results = db.query(models.FrameOcrResult) \
+                .filter(models.FrameOcrResult.key.in_(db_keys)) \
+                .all()
+        finally:
+            db.close()
+        for db_result in db_results:
+            annotation = ImageAnnotation(
+                db_result.description, db_result.player_name
+            )
+            self.remember(db_result.key, annotation)
+            result[db_result.key] = annotation
+        with self.lock:
+            self.stats.db_hits += len(db_results)
+        return result
+
+    def set_many(self, annotations: Dict[str, ImageAnnotation]) -> None:
+        if len(annotations) == 0:
+            return
+        for key, annotation in annotations.items():
+            self.remember(key, annotation)
+
+        db = SessionLocal()
+        try:
+            # (other workers may have stored the same frames meanwhile)
+            db.execute(
+                insert(models.FrameOcrResult)
+                    .values([
+                        {
+                            "key": key,
+                            "description": annotation.description,
+                            "player_name": annotation.player_name,
+                        } for key, annotation in annotations.items()
+                    ])
+                    .on_conflict_do_nothing(index_elements=["key"])
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def annotate(
+        self, frames: Iterable[Image.Image], backend: OCRBackend
+    ) -> Tuple[List[ImageAnnotation], OCRBackend]:
+        # same as backend.annotate_images_by(frames) except that cached
+        # frames are not sent (results are looked up under backend.name,
+        # and stored under the name of the backend that produced them)
+        # frames must be iterable more than once, e.g. a GifManager: they
+        # are hashed one at a time, and the ones to send are decoded again
+        # rather than kept in memory
+        if iter(frames) is frames:
+            raise TypeError("frames must be iterable more than once")
+        digests = [frame_hash(image) for image in frames]
+        keys = [f"{backend.name}:{digest}" for digest in digests]
+        with self.lock:
+            self.stats.frames += len(keys)
+
+        # identical frames in a GIF are sent only once
+        first_indices: Dict[str, int] = {}
+        for i, key in enumerate(keys):
+            first_indices.setdefault(key, i)
+        cached = self.get_many(list(first_indices.keys()))
+        missed_indices = sorted(
+            i for key, i in first_indices.items() if key not in cached
+        )
+        with self.lock:
+            self.stats.sent += len(missed_indices)
+
+        annotations: Dict[str, ImageAnnotation] = {}
+        answered_by = backend
+        if len(missed_indices):
+            sent_annotations, answered_by = backend.annotate_images_by(
+                SelectedFrames(frames, missed_indices)
+            )
+            annotations = dict(zip(
+                (keys[i] for i in missed_indices), sent_annotations
+            ))
+            if answered_by.persistent:
+                self.set_many({
+                    f"{answered_by.name}:{digests[i]}": annotation
+                    for i, annotation in zip(missed_indices, sent_annotations)
+                })
+
+        annotations.update(cached)
+        return [annotations[key] for key in keys], answered_by
+
+
+# frames at the given indices of frames, decoded again on every iteration
+# (so that FallbackBackend can pass them to a second backend)
+class SelectedFrames:
+    frames: Iterable[Image.Image]
+    indices: Set[int]
+
+    def __init__(self, frames: Iterable[Image.Image], indices: Iterable[int]):
+        self.frames = frames
+        self.indices = set(indices)
+
+    def __iter__(self) -> Iterator[Image.Image]:
+        last_index = max(self.indices, default=-1)
+        for i, image in enumerate(self.frames):
+            if i > last_index:
+                break
+            if i in self.indices:
+                yield image
+
+
+frame_ocr_cache = FrameOcrCache(FRAME_OCR_CACHE_LRU_MAX_ENTRIES)
@@ -1,4 +1,6 @@
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Table
+from sqlalchemy import (
+    BigInteger, Column, DateTime, ForeignKey, Index, Integer, JSON, String, Table, Text
+)
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declared_attr
 from sqlalchemy.sql import functions
@@ -104,6 +106,17 @@ class User(Base, TimestampMixin):
 
 class Album(Base, TimestampMixin):
     __tablename__ = "album"
+    __table_args__ = (
+        # for keyset pagination ordered by played_at
+        Index("ix_album_played_at_id", "played_at", "id"),
+        # for sorting albums by these counts (sub ordered by played_at)
+        Index("ix_album_page_count_played_at", "page_count", "played_at"),
+        Index(
+            "ix_album_bookmark_count_played_at",
+            "bookmark_count",
+            "played_at"
+        ),
+    )
 
     id = Column(
         Integer,
@@ -133,11 +146,31 @@ class Album(Base, TimestampMixin):
     pv_count = Column(
         Integer,
         default=0,
+        server_default="0",
+        nullable=False,
     )
 
     download_count = Column(
         Integer,
         default=0,
+        server_default="0",
+        nullable=False,
+    )
+
+    # denormalized count of pages
+    page_count = Column(
+        Integer,
+        default=0,
+        server_default="0",
+        nullable=False,
+    )
+
+    # denormalized count of bookmarks
+    bookmark_count = Column(
+        Integer,
+        default=0,
+        server_default="0",
+        nullable=False,
     )
 
     gamemode_id = Column(
@@ -146,7 +179,7 @@ class Album(Base, TimestampMixin):
 
     played_at = Column(
         DateTime(True),
-        nullable=True,
+        nullable=False,
     )
 
     deleted_at = Column(
@@ -174,6 +207,21 @@ class Album(Base, TimestampMixin):
 
 class Page(Base, TimestampMixin):
     __tablename__ = "page"
+    __table_args__ = (
+        # for substring search (requires pg_trgm extension)
+        Index(
+            "ix_page_description_trgm",
+            "description",
+            postgresql_using="gin",
+            postgresql_ops={"description": "gin_trgm_ops"},
+        ),
+        Index(
+            "ix_page_player_name_trgm",
+            "player_name",
+            postgresql_using="gin",
+            postgresql_ops={"player_name": "gin_trgm_ops"},
+        ),
+    )
 
     id = Column(
         Integer,
@@ -184,6 +232,7 @@ class Page(Base, TimestampMixin):
 
     album_id = Column(
         ForeignKey("album.id", ondelete="CASCADE"),
+        index=True,
     )
 
     index = Column(
@@ -221,6 +270,15 @@ class Gamemode(Base, TimestampMixin):
 
 class Tag(Base, TimestampMixin):
     __tablename__ = "tag"
+    __table_args__ = (
+        # for substring search (requires pg_trgm extension)
+        Index(
+            "ix_tag_name_trgm",
+            "name",
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        ),
+    )
 
     id = Column(
         Integer,
@@ -263,3 +321,125 @@ class TempAlbum(Base, TimestampMixin):
         default=None,
         nullable=True,
     )
+
+
+OCR_JOB_STATUS_QUEUED = "queued"
+OCR_JOB_STATUS_RUNNING = "running"
+OCR_JOB_STATUS_DONE = "done"
+OCR_JOB_STATUS_FAILED = "failed"
+
+
+# OCR of a temp_album, drained by OCR job workers
+class OcrJob(Base, TimestampMixin):
+    __tablename__ = "ocr_job"
+    __table_args__ = (
+        # workers pick the oldest queued job
+        Index("ix_ocr_job_status_created_at", "status", "created_at"),
+    )
+
+    id = Column(
+        Integer,
+        primary_key=True,
+        autoincrement=True,
+        index=True,
+    )
+
+    temp_album_uuid = Column(
+        String(128),
+        ForeignKey("temp_album.uuid"),
+        unique=True,
+        nullable=False,
+    )
+
+    status = Column(
+        String(16),
+        default=OCR_JOB_STATUS_QUEUED,
+        nullable=False,
+    )
+
+    attempts = Column(
+        Integer,
+        default=0,
+        server_default="0",
+        nullable=False,
+    )
+
+    # list of {"description": ..., "playerName": ...} once done
+    page_meta_data = Column(
+        JSON,
+        nullable=True,
+    )
+
+    error = Column(
+        String(1024),
+        nullable=True,
+    )
+
+
+# OCR results per SHA-256 of the uploaded GIF, so that the same file is
+# not sent to OCR again
+class OcrResult(Base, TimestampMixin):
+    __tablename__ = "ocr_result"
+
+    hash = Column(
+        String(128),
+        primary_key=True,
+    )
+
+    # name of the OCR backend that produced the results
+    # (see ocr.backends.OCRBackend.name)
+    backend = Column(
+        String(64),
+        primary_key=True,
+    )
+
+    # list of {"description": ..., "playerName": ...}
+    page_meta_data = Column(
+        JSON,
+        nullable=False,
+    )
+
+
+# OCR results per frame, keyed by OCR backend and exact digest of the
+# annotated regions (see ocr.image_annotator.frame_hash)
+class FrameOcrResult(Base, TimestampMixin):
+    __tablename__ = "frame_ocr_result"
+
+    key = Column(
+        String(128),
+        primary_key=True,
+    )
+
+    description = Column(
+        Text,
+        nullable=False,
+    )
+
+    player_name = Column(
+        Text,
+        nullable=False,
+    )
+
+
+COLLECTION_ALBUMS = "albums"
+COLLECTION_TAGS = "tags"
+COLLECTION_GAMEMODES = "gamemodes"
+
+
+# version counters bumped by writes to each collection, so that list reads
+# can answer conditional requests by a primary key lookup
+# (updated_at of the row is when the collection last changed)
+class CollectionVersion(Base, TimestampMixin):
+    __tablename__ = "collection_version"
+
+    name = Column(
+        String(64),
+        primary_key=True,
+    )
+
+    version = Column(
+        BigInteger,
+        default=0,
+        server_default="0",
+        nullable=False,
+    )
@@ -0,0 +1,92 @@
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Union
+
+
+STORAGE_BACKEND_S3 = "s3"
+STORAGE_BACKEND_LOCAL = "local"
+
+CONTENT_KEY_PREFIX = "albums/v2"
+
+# objects are keyed by content, so they never change once stored
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+STORE_WORKERS = 4
+
+
+@dataclass
+class UploadResult:
+    uri: str
+    size: int
+    secs: float
+    # the same content was stored before and not uploaded again
+    existed: bool = False
+
+
+def content_key(hash_str: str, suffix: str) -> str:
+    # key by SHA-256 of the album file, e.g. albums/v2/<hash>_thumb.gif
+    return f"{CONTENT_KEY_PREFIX}/{hash_str}{suffix}"
+
+
+# (threads are started on first submit, not at import)
+store_executor = ThreadPoolExecutor(max_workers=STORE_WORKERS)
+
+
+class StorageBackend:
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError()
+
+    def put(self, src: str, key: str) -> None:
+        raise NotImplementedError()
+
+    def url(self, key: str) -> str:
+        # URL clients fetch the object from
+        raise NotImplementedError()
+
+    def store(self, src: str, key: str) -> UploadResult:
+        # keys are content addressed: skip uploading what is stored already
+        start = time.perf_counter()
+        existed = self.exists(key)
+        if not existed:
+            self.put(src, key)
+        return UploadResult(
+            self.url(key),
+            os.path.getsize(src),
+            time.perf_counter() - start,
+            existed
+        )
+
+    def submit_store(self, src: str, key: str) -> "Future[UploadResult]":
+        # stores in the background
+        return store_executor.submit(self.store, src, key)
+
+
+storage_backend: Union[StorageBackend, None] = None
+storage_backend_lock = threading.Lock()
+
+
+def get_storage_backend() -> StorageBackend:
+    # configured by STORAGE_BACKEND: s3 (default) or local
+    # (see LocalStorageBackend for settings of local)
+    global storage_backend
+    with storage_backend_lock:
+        if storage_backend is None:
+            name = os.environ.get("STORAGE_BACKEND", STORAGE_BACKEND_S3)
+            if name == STORAGE_BACKEND_S3:
+                from storage.s3 import S3StorageBackend
+                storage_backend = S3StorageBackend()
+            elif name == STORAGE_BACKEND_LOCAL:
+                from storage.local import LocalStorageBackend
+                storage_backend = LocalStorageBackend(
+                    os.environ.get("STORAGE_LOCAL_DIR", "storage_data"),
+                    os.environ.get(
+                        "STORAGE_LOCAL_BASE_URL",
+                        "http://localhost:8000/storage"
+                    )
+                )
+            else:
+                raise ValueError(f"Unknown STORAGE_BACKEND: {name}")
+    return storage_backend
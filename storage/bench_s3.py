@@ -0,0 +1,74 @@
+import argparse
+import os
+import tempfile
+import time
+
+import boto3
+from botocore.config import Config
+
+from storage import s3
+from storage.fake_s3 import FakeS3Server
+
+
+def upload_legacy(src: str, dst: str) -> str:
+    # implementation before the client was shared
+    client = boto3.client(
+        "s3",
+        endpoint_url=os.environ["S3_ENDPOINT_URL"],
+        config=Config(s3={"addressing_style": "path"})
+    )
+    client.upload_file(src, os.environ["AWS_S3_BUCKET_NAME"], dst)
+    return dst
+
+
+if __name__ == "__main__":
+    # python -m storage.bench_s3
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-s", "--sizes-mb", type=float, nargs="+",
+                    default=[2, 20])
+    ap.add_argument("-t", "--thumb-mb", type=float, default=0.5)
+    ap.add_argument("-l", "--latency", type=float, default=0.05)
+    ap.add_argument("-b", "--bandwidth-mb", type=float, default=20)
+    ap.add_argument("-n", "--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    server = FakeS3Server(args.latency, args.bandwidth_mb * s3.MB)
+    server.start()
+    os.environ["S3_ENDPOINT_URL"] = server.endpoint_url
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "fake")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "fake")
+    os.environ.setdefault("AWS_DEFAULT_REGION", "ap-northeast-1")
+    os.environ.setdefault("AWS_S3_BUCKET_NAME", "bench")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        thumb_path = os.path.join(tmp, "thumb.gif")
+        with open(thumb_path, "wb") as f:
+            f.write(os.urandom(int(args.thumb_mb * s3.MB)))
+
+        for size_mb in args.sizes_mb:
+            src_path = os.path.join(tmp, "album.gif")
+            with open(src_path, "wb") as f:
+                f.write(os.urandom(int(size_mb * s3.MB)))
+            print(f"original {size_mb}MB + thumb {args.thumb_mb}MB")
+
+            start = time.perf_counter()
+            for i in range(args.repeat):
+                upload_legacy(src_path, f"legacy/{i}.gif")
+                upload_legacy(thumb_path, f"legacy/{i}_thumb.gif")
+            legacy_secs = (time.perf_counter() - start) / args.repeat
+            print(f"  sequential, client per call: {legacy_secs:.3f}s")
+
+            start = time.perf_counter()
+            for i in range(args.repeat):
+                results = s3.upload_many([
+                    (src_path, f"pooled/{i}.gif"),
+                    (thumb_path, f"pooled/{i}_thumb.gif"),
+                ])
+            pooled_secs = (time.perf_counter() - start) / args.repeat
+            print(f"  parallel, shared client:     {pooled_secs:.3f}s "
+                  + "(" + ", ".join(
+                      f"{result.size / s3.MB:.1f}MB {result.secs:.3f}s"
+                      for result in results
+                  ) + ")")
+
+    server.stop()
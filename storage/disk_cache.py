@@ -0,0 +1,197 @@
+import fcntl
+import hashlib
+import os
+import re
+import threading
+import time
+import uuid
+from typing import BinaryIO, Iterator, Union
+
+import requests
+
+from storage.stream import iter_stream
+
+
+MB = 1024 * 1024
+
+DEFAULT_ALBUM_DISK_CACHE_DIR = "album_cache"
+DEFAULT_ALBUM_DISK_CACHE_MAX_MB = 1024
+
+# temporary files left by killed processes are removed after this
+ALBUM_DISK_CACHE_STALE_TEMP_SECS = 3600
+
+# stats are printed every this many lookups
+ALBUM_DISK_CACHE_STATS_INTERVAL = 100
+
+TEMP_SUFFIX = ".tmp"
+LOCK_FILE_NAME = ".lock"
+
+HASH_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+
+class AlbumDiskCacheStats:
+    hits: int
+    misses: int
+    stores: int
+    evictions: int
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def lookups(self) -> int:
+        return self.hits + self.misses
+
+    def hit_rate(self) -> float:
+        if self.lookups() == 0:
+            return 0.0
+        return self.hits / self.lookups()
+
+    def __str__(self) -> str:
+        return f"hits={self.hits} misses={self.misses} " \
+                + f"stores={self.stores} evictions={self.evictions} " \
+                + f"hit_rate={self.hit_rate():.3f}"
+
+
+# album GIFs on local disk keyed by SHA-256 of their contents, so that
+# popular albums are not fetched from storage on every download
+# (shared by processes using the same directory: files appear by atomic
+# rename, and readers keep evicted files open until they finish;
+# mtime is bumped on hits and the oldest files are evicted first)
+class AlbumDiskCache:
+    root_dir: str
+    max_bytes: int
+    stats: AlbumDiskCacheStats
+
+    def __init__(self, root_dir: str, max_bytes: int) -> None:
+        self.root_dir = os.path.abspath(root_dir)
+        self.max_bytes = max_bytes
+        self.stats = AlbumDiskCacheStats()
+        self.lock = threading.Lock()
+
+    def path(self, hash_str: str) -> str:
+        # raises ValueError for anything but SHA-256 hex digests
+        if HASH_PATTERN.match(hash_str) is None:
+            raise ValueError(f"Invalid hash: {hash_str}")
+        return os.path.join(self.root_dir, hash_str[:2], f"{hash_str}.gif")
+
+    def count_lookup(self, hit: bool) -> None:
+        with self.lock:
+            if hit:
+                self.stats.hits += 1
+            else:
+                self.stats.misses += 1
+            if self.stats.lookups() % ALBUM_DISK_CACHE_STATS_INTERVAL:
+                return
+            stats = str(self.stats)
+        print(f"Album disk cache: {stats}")
+
+    def open(self, hash_str: str) -> Union[BinaryIO, None]:
+        # returns None on misses
+        path = self.path(hash_str)
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            self.count_lookup(False)
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # evicted just now; f is still readable
+            pass
+        self.count_lookup(True)
+        return f
+
+    def iter_store(
+        self, response: requests.Response, hash_str: str
+    ) -> Iterator[bytes]:
+        # passes the body of response through while writing it to the
+        # cache; it is stored only if read to the end and the hash matches
+        # (e.g. not when the client disconnects halfway)
+        path = self.path(hash_str)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{uuid.uuid4().hex}{TEMP_SUFFIX}"
+        hasher = hashlib.sha256()
+        try:
+            with open(temp_path, "wb") as f:
+                for chunk in iter_stream(response):
+                    f.write(chunk)
+                    hasher.update(chunk)
+                    yield chunk
+            if hasher.hexdigest() == hash_str:
+                os.replace(temp_path, path)
+                with self.lock:
+                    self.stats.stores += 1
+                self.evict()
+                print(f"Album disk cache: stored {hash_str} ({self.stats})")
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def evict(self) -> None:
+        # removes least recently used files until max_bytes fits
+        # (one process at a time; others skip instead of waiting)
+        with open(os.path.join(self.root_dir, LOCK_FILE_NAME), "w") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return
+
+            entries = []
+            total_bytes = 0
+            now = time.time()
+            for dir_entry in os.scandir(self.root_dir):
+                if not dir_entry.is_dir():
+                    continue
+                for entry in os.scandir(dir_entry.path):
+                    try:
+                        st = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    if entry.name.endswith(TEMP_SUFFIX):
+                        if now - st.st_mtime \
+                                > ALBUM_DISK_CACHE_STALE_TEMP_SECS:
+                            os.remove(entry.path)
+                        continue
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+                    total_bytes += st.st_size
+
+            evictions = 0
+            for _, size, path in sorted(entries):
+                if total_bytes <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total_bytes -= size
+                evictions += 1
+            with self.lock:
+                self.stats.evictions += evictions
+
+
+album_disk_cache: Union[AlbumDiskCache, None] = None
+album_disk_cache_configured = False
+album_disk_cache_lock = threading.Lock()
+
+
+def get_album_disk_cache() -> Union[AlbumDiskCache, None]:
+    # configured on first use, after .env is loaded, by
+    # ALBUM_DISK_CACHE_DIR and ALBUM_DISK_CACHE_MAX_MB (0 disables it)
+    global album_disk_cache, album_disk_cache_configured
+    with album_disk_cache_lock:
+        if not album_disk_cache_configured:
+            max_bytes = int(os.environ.get(
+                "ALBUM_DISK_CACHE_MAX_MB", DEFAULT_ALBUM_DISK_CACHE_MAX_MB
+            )) * MB
+            if max_bytes > 0:
+                album_disk_cache = AlbumDiskCache(
+                    os.environ.get(
+                        "ALBUM_DISK_CACHE_DIR", DEFAULT_ALBUM_DISK_CACHE_DIR
+                    ),
+                    max_bytes
+                )
+            album_disk_cache_configured = True
+    return album_disk_cache
@@ -0,0 +1,131 @@
+import hashlib
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Tuple
+from urllib.parse import parse_qs, urlparse
+
+
+# in-process stand-in for S3 to benchmark uploads offline
+# (supports PutObject and multipart uploads, which is what upload_file
+# uses; latency_secs per request and bytes_per_sec per connection
+# simulate the network)
+class FakeS3Server:
+    latency_secs: float
+    bytes_per_sec: float
+    objects: Dict[str, int]
+    requests: int
+
+    def __init__(
+        self, latency_secs: float = 0.05, bytes_per_sec: float = 20e6
+    ) -> None:
+        self.latency_secs = latency_secs
+        self.bytes_per_sec = bytes_per_sec
+        self.objects = {}
+        self.parts: Dict[str, Dict[int, int]] = {}
+        self.requests = 0
+        self.lock = threading.Lock()
+
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def read_body(self) -> bytes:
+                if self.headers.get("Transfer-Encoding") == "chunked":
+                    body = b""
+                    while True:
+                        size = int(self.rfile.readline().split(b";")[0], 16)
+                        if size == 0:
+                            # trailers end with an empty line
+                            while self.rfile.readline() not in (b"\r\n", b""):
+                                pass
+                            return body
+                        body += self.rfile.read(size)
+                        self.rfile.readline()
+                return self.rfile.read(
+                    int(self.headers.get("Content-Length", 0))
+                )
+
+            def respond(self, body: bytes = b"", etag: str = None) -> None:
+                self.send_response(200)
+                if etag is not None:
+                    self.send_header("ETag", f'"{etag}"')
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def simulate(self, n_bytes: int) -> Tuple[str, Dict]:
+                with fake.lock:
+                    fake.requests += 1
+                time.sleep(fake.latency_secs + n_bytes / fake.bytes_per_sec)
+                url = urlparse(self.path)
+                return url.path, parse_qs(url.query, keep_blank_values=True)
+
+            def do_PUT(self) -> None:
+                body = self.read_body()
+                path, query = self.simulate(len(body))
+                etag = hashlib.md5(body).hexdigest()
+                with fake.lock:
+                    if "uploadId" in query:
+                        fake.parts[query["uploadId"][0]][
+                            int(query["partNumber"][0])
+                        ] = len(body)
+                    else:
+                        fake.objects[path] = len(body)
+                self.respond(etag=etag)
+
+            def do_HEAD(self) -> None:
+                path, _ = self.simulate(0)
+                with fake.lock:
+                    size = fake.objects.get(path)
+                self.send_response(404 if size is None else 200)
+                self.send_header("Content-Length", str(size or 0))
+                self.end_headers()
+
+            def do_POST(self) -> None:
+                self.read_body()
+                path, query = self.simulate(0)
+                bucket, key = path.lstrip("/").split("/", 1)
+                if "uploads" in query:
+                    upload_id = uuid.uuid4().hex
+                    with fake.lock:
+                        fake.parts[upload_id] = {}
+                    self.respond((
+                        "<InitiateMultipartUploadResult>"
+                        + f"<Bucket>{bucket}</Bucket><Key>{key}</Key>"
+                        + f"<UploadId>{upload_id}</UploadId>"
+                        + "</InitiateMultipartUploadResult>"
+                    ).encode())
+                else:
+                    with fake.lock:
+                        parts = fake.parts.pop(query["uploadId"][0])
+                        fake.objects[path] = sum(parts.values())
+                    self.respond((
+                        "<CompleteMultipartUploadResult>"
+                        + f"<Bucket>{bucket}</Bucket><Key>{key}</Key>"
+                        + '<ETag>"fake"</ETag>'
+                        + "</CompleteMultipartUploadResult>"
+                    ).encode())
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, daemon=True
+        )
+
+    @property
+    def endpoint_url(self) -> str:
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self) -> None:
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
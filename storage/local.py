@@ -0,0 +1,37 @@
+import os
+import shutil
+import uuid
+
+from storage.backend import StorageBackend
+
+
+# stores objects under a local directory, served by GET /storage/{key}
+# (STORAGE_LOCAL_DIR, STORAGE_LOCAL_BASE_URL: URL of that route)
+class LocalStorageBackend(StorageBackend):
+    root_dir: str
+    base_url: str
+
+    def __init__(self, root_dir: str, base_url: str) -> None:
+        self.root_dir = os.path.abspath(root_dir)
+        self.base_url = base_url.rstrip("/")
+
+    def local_path(self, key: str) -> str:
+        # raises ValueError for keys pointing outside root_dir
+        path = os.path.abspath(os.path.join(self.root_dir, key))
+        if not path.startswith(self.root_dir + os.sep):
+            raise ValueError(f"Invalid key: {key}")
+        return path
+
+    def exists(self, key: str) -> bool:
+        return os.path.isfile(self.local_path(key))
+
+    def put(self, src: str, key: str) -> None:
+        path = self.local_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # readers never see a partially written file
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        shutil.copyfile(src, temp_path)
+        os.replace(temp_path, path)
+
+    def url(self, key: str) -> str:
+        return f"{self.base_url}/{key}"
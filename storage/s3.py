@@ -1,18 +1,136 @@
+import mimetypes
 import os
+import threading
+import time
+from typing import Dict, List, Tuple, Union
 
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import ClientError
 
+from storage.backend import (
+    IMMUTABLE_CACHE_CONTROL, StorageBackend, UploadResult, store_executor
+)
 
-def upload(src: str, dst: str) -> str:
-    client = boto3.client("s3")
 
+MB = 1024 * 1024
+
+# connections kept by the shared client; should cover concurrent uploads
+# times S3_MAX_CONCURRENCY
+DEFAULT_S3_MAX_POOL_CONNECTIONS = 32
+# files larger than the threshold are sent as multipart uploads of
+# chunksize parts, S3_MAX_CONCURRENCY of them at once
+DEFAULT_S3_MULTIPART_THRESHOLD_MB = 8
+DEFAULT_S3_MULTIPART_CHUNKSIZE_MB = 8
+DEFAULT_S3_MAX_CONCURRENCY = 8
+
+
+s3_client = None
+s3_client_lock = threading.Lock()
+
+transfer_config = None
+transfer_config_lock = threading.Lock()
+
+
+def get_client():
+    # created once per process and shared by threads
+    # (S3_ENDPOINT_URL points to S3 compatible storage or storage.fake_s3)
+    global s3_client
+    with s3_client_lock:
+        if s3_client is None:
+            endpoint_url = os.environ.get("S3_ENDPOINT_URL")
+            config = Config(max_pool_connections=int(os.environ.get(
+                "S3_MAX_POOL_CONNECTIONS", DEFAULT_S3_MAX_POOL_CONNECTIONS
+            )))
+            if endpoint_url is not None:
+                config = config.merge(Config(s3={"addressing_style": "path"}))
+            s3_client = boto3.client(
+                "s3", endpoint_url=endpoint_url, config=config
+            )
+    return s3_client
+
+
+def get_transfer_config() -> TransferConfig:
+    # created on first upload, after .env is loaded
+    global transfer_config
+    with transfer_config_lock:
+        if transfer_config is None:
+            transfer_config = TransferConfig(
+                multipart_threshold=int(os.environ.get(
+                    "S3_MULTIPART_THRESHOLD_MB",
+                    DEFAULT_S3_MULTIPART_THRESHOLD_MB
+                )) * MB,
+                multipart_chunksize=int(os.environ.get(
+                    "S3_MULTIPART_CHUNKSIZE_MB",
+                    DEFAULT_S3_MULTIPART_CHUNKSIZE_MB
+                )) * MB,
+                max_concurrency=int(os.environ.get(
+                    "S3_MAX_CONCURRENCY", DEFAULT_S3_MAX_CONCURRENCY
+                )),
+            )
+    return transfer_config
+
+
+def object_url(key: str) -> str:
     region = os.environ["AWS_DEFAULT_REGION"]
     bucket_name = os.environ["AWS_S3_BUCKET_NAME"]
+    return f"https://s3.{region}.amazonaws.com/{bucket_name}/{key}"
 
-    client.upload_file(
+
+def upload_timed(
+    src: str, dst: str, extra_args: Union[Dict[str, str], None] = None
+) -> UploadResult:
+    extra_args = dict(extra_args or {})
+    content_type, _ = mimetypes.guess_type(dst)
+    if content_type is not None:
+        extra_args.setdefault("ContentType", content_type)
+
+    start = time.perf_counter()
+    get_client().upload_file(
         src,
-        bucket_name,
-        dst
+        os.environ["AWS_S3_BUCKET_NAME"],
+        dst,
+        ExtraArgs=extra_args,
+        Config=get_transfer_config()
     )
 
-    return f"https://s3.{region}.amazonaws.com/{bucket_name}/{dst}"
+    return UploadResult(
+        object_url(dst),
+        os.path.getsize(src),
+        time.perf_counter() - start
+    )
+
+
+def upload_many(
+    src_dst_pairs: List[Tuple[str, str]]
+) -> List[UploadResult]:
+    # uploads files in parallel
+    futures = [
+        store_executor.submit(upload_timed, src, dst)
+        for src, dst in src_dst_pairs
+    ]
+    return [future.result() for future in futures]
+
+
+class S3StorageBackend(StorageBackend):
+    def exists(self, key: str) -> bool:
+        try:
+            get_client().head_object(
+                Bucket=os.environ["AWS_S3_BUCKET_NAME"],
+                Key=key
+            )
+        except ClientError as e:
+            # without s3:ListBucket on the bucket, S3 answers 403 instead of
+            # 404 for missing keys; the object is uploaded again then
+            # (keys are content addressed, so overwriting is harmless)
+            if e.response["Error"]["Code"] in ("403", "404", "NoSuchKey"):
+                return False
+            raise
+        return True
+
+    def put(self, src: str, key: str) -> None:
+        upload_timed(src, key, {"CacheControl": IMMUTABLE_CACHE_CONTROL})
+
+    def url(self, key: str) -> str:
+        return object_url(key)
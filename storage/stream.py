@@ -0,0 +1,83 @@
+import os
+import threading
+from typing import Dict, Iterator, Mapping
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+STREAM_CHUNK_SIZE = 64 * 1024 # 64 KiB
+
+# connections kept by the shared session; should cover concurrent downloads
+DEFAULT_STORAGE_HTTP_POOL_SIZE = 16
+DEFAULT_STORAGE_HTTP_TIMEOUT_SECS = 10
+
+# headers passed to storage so that it answers ranges and validators itself
+FORWARDED_REQUEST_HEADERS = (
+    "Range", "If-Range", "If-Match", "If-None-Match",
+    "If-Modified-Since", "If-Unmodified-Since",
+)
+FORWARDED_RESPONSE_HEADERS = (
+    "Content-Type", "Content-Length", "Content-Range", "Accept-Ranges",
+    "ETag", "Last-Modified", "Cache-Control",
+)
+
+
+http_session = None
+http_timeout_secs = DEFAULT_STORAGE_HTTP_TIMEOUT_SECS
+http_session_lock = threading.Lock()
+
+
+def get_http_session() -> requests.Session:
+    # created once per process and shared by threads
+    # (STORAGE_HTTP_POOL_SIZE and STORAGE_HTTP_TIMEOUT_SECS are read then,
+    # after .env is loaded)
+    global http_session, http_timeout_secs
+    with http_session_lock:
+        if http_session is None:
+            pool_size = int(os.environ.get(
+                "STORAGE_HTTP_POOL_SIZE", DEFAULT_STORAGE_HTTP_POOL_SIZE
+            ))
+            http_timeout_secs = float(os.environ.get(
+                "STORAGE_HTTP_TIMEOUT_SECS", DEFAULT_STORAGE_HTTP_TIMEOUT_SECS
+            ))
+            http_session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=pool_size, pool_maxsize=pool_size
+            )
+            http_session.mount("http://", adapter)
+            http_session.mount("https://", adapter)
+    return http_session
+
+
+def open_stream(
+    url: str, request_headers: Mapping[str, str]
+) -> requests.Response:
+    # only headers are read here; the body is left to iter_stream
+    # (Range etc. are taken from request_headers of the client)
+    headers = {
+        name: request_headers[name]
+        for name in FORWARDED_REQUEST_HEADERS if name in request_headers
+    }
+    # bytes are relayed as is, so Content-Length/Range stay valid
+    headers["Accept-Encoding"] = "identity"
+    session = get_http_session()
+    return session.get(
+        url, headers=headers, stream=True, timeout=http_timeout_secs
+    )
+
+
+def stream_headers(response: requests.Response) -> Dict[str, str]:
+    return {
+        name: response.headers[name]
+        for name in FORWARDED_RESPONSE_HEADERS if name in response.headers
+    }
+
+
+def iter_stream(response: requests.Response) -> Iterator[bytes]:
+    # STREAM_CHUNK_SIZE at a time; the connection returns to the pool
+    # when the body is exhausted or closed
+    try:
+        yield from response.raw.stream(STREAM_CHUNK_SIZE, decode_content=False)
+    finally:
+        response.close()
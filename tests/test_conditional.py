@@ -0,0 +1,19 @@
+from routers.conditional import etag_matches, if_range_matches
+
+
+def test_etag_matches_weakly():
+    assert etag_matches('"a"', '"a"')
+    assert etag_matches('W/"a"', '"a"')
+    assert etag_matches('"b", W/"a"', 'W/"a"')
+    assert etag_matches("*", '"a"')
+    assert not etag_matches('"b"', '"a"')
+    assert not etag_matches(None, '"a"')
+
+
+def test_if_range_matches_strongly():
+    assert if_range_matches(None, '"a"')
+    assert if_range_matches('"a"', '"a"')
+    assert not if_range_matches('W/"a"', '"a"')
+    assert not if_range_matches('"a"', 'W/"a"')
+    assert not if_range_matches('"b"', '"a"')
+    assert not if_range_matches("Sat, 17 Oct 2026 10:00:00 GMT", '"a"')
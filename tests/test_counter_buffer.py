@@ -0,0 +1,41 @@
+import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from sql_interface import counter_buffer as counter_buffer_module
+from sql_interface import models
+from sql_interface.counter_buffer import AlbumCounterBuffer
+from sql_interface.database import Base
+
+
+LONG_AGO = datetime.datetime(2000, 1, 1)
+
+
+def test_flush_keeps_updated_at(monkeypatch):
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    Base.metadata.create_all(engine)
+    session_local = sessionmaker(bind=engine)
+    monkeypatch.setattr(counter_buffer_module, "SessionLocal", session_local)
+    with session_local() as db:
+        db.add(models.Album(
+            id=1, source="album.gif", played_at=LONG_AGO,
+            pv_count=1, download_count=0, updated_at=LONG_AGO
+        ))
+        db.commit()
+
+        buffer = AlbumCounterBuffer()
+        buffer.add(1, pv=2, dl=1)
+        assert buffer.pending(1) == (2, 1)
+        buffer.flush()
+        assert buffer.pending(1) == (0, 0)
+
+        db.expire_all()
+        album = db.get(models.Album, 1)
+        assert (album.pv_count, album.download_count) == (3, 1)
+        assert album.updated_at == LONG_AGO
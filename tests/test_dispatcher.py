@@ -0,0 +1,83 @@
+import os
+import threading
+from typing import List
+
+import pytest
+from google.cloud.vision_v1.types import BatchAnnotateImagesResponse
+
+from ocr.fake_vision import FakeImageAnnotatorClient, fake_response_id
+from ocr.image_annotator import AnnotateBatchDispatcher
+
+
+def make_request() -> dict:
+    return {"image": {"content": os.urandom(8)}}
+
+
+def test_requests_of_threads_are_merged_and_routed_back():
+    client = FakeImageAnnotatorClient(0.05, 0)
+    dispatcher = AnnotateBatchDispatcher(
+        client, max_batch_size=8, max_wait_secs=1, max_in_flight_batches=2
+    )
+    n_threads, n_requests = 4, 4
+    barrier = threading.Barrier(n_threads)
+    misrouted: List[int] = []
+
+    def caller(n: int) -> None:
+        requests = [make_request() for _ in range(n_requests)]
+        barrier.wait()
+        futures = [dispatcher.submit(request) for request in requests]
+        for request, future in zip(requests, futures):
+            air = future.result(timeout=5)
+            if air.text_annotations[0].description \
+                    != fake_response_id(request):
+                misrouted.append(n)
+
+    threads = [
+        threading.Thread(target=caller, args=(n,)) for n in range(n_threads)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    dispatcher.stop()
+
+    assert misrouted == []
+    # 16 requests sent in full batches rather than one call per thread
+    assert client.batch_sizes == [8, 8]
+
+
+def test_stop_sends_pending_requests():
+    client = FakeImageAnnotatorClient(0, 0)
+    # (requests would otherwise wait for more until max_wait_secs)
+    dispatcher = AnnotateBatchDispatcher(
+        client, max_batch_size=8, max_wait_secs=60, max_in_flight_batches=1
+    )
+    requests = [make_request() for _ in range(3)]
+    futures = [dispatcher.submit(request) for request in requests]
+    dispatcher.stop()
+
+    assert client.batch_sizes == [3]
+    assert [
+        future.result(timeout=0).text_annotations[0].description
+        for future in futures
+    ] == [fake_response_id(request) for request in requests]
+
+
+class ShortResponseClient:
+    def batch_annotate_images(
+        self, requests: List[dict]
+    ) -> BatchAnnotateImagesResponse:
+        return FakeImageAnnotatorClient(0, 0) \
+            .batch_annotate_images(requests[1:])
+
+
+def test_short_response_fails_every_request():
+    dispatcher = AnnotateBatchDispatcher(
+        ShortResponseClient(), max_batch_size=2, max_wait_secs=1,
+        max_in_flight_batches=1
+    )
+    futures = [dispatcher.submit(make_request()) for _ in range(2)]
+    for future in futures:
+        with pytest.raises(RuntimeError):
+            future.result(timeout=5)
+    dispatcher.stop()
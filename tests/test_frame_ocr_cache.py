@@ -0,0 +1,212 @@
+import threading
+from io import BytesIO
+from typing import Iterable, List
+
+import pytest
+from PIL import Image, ImageDraw, ImageFont
+from sqlalchemy import create_engine
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from ocr import backends as ocr_backends_module
+from ocr.backends import FallbackBackend, OCRBackend, StubBackend
+from ocr.gif import GifManager
+from ocr.image_annotator import (
+    AREA_BOUND_PLAYER, AREA_BOUND_SUBT, ImageAnnotation, frame_hash
+)
+from sql_interface import frame_ocr_cache as frame_ocr_cache_module
+from sql_interface import models
+from sql_interface.frame_ocr_cache import FrameOcrCache
+
+
+def make_frame(subtitle: str, player_name: str = "Alice") -> Image.Image:
+    # small bitmap glyphs: one character changes only a few pixels
+    image = Image.new("RGB", (720, 540), (40, 40, 40))
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default()
+    draw.text(AREA_BOUND_SUBT[0], subtitle, fill=(255, 255, 255), font=font)
+    draw.text(AREA_BOUND_PLAYER[0], player_name, fill=(255, 255, 255),
+              font=font)
+    return image
+
+
+def gif_round_trip(images: List[Image.Image]) -> List[Image.Image]:
+    buffer = BytesIO()
+    images[0].save(buffer, "GIF", save_all=True, append_images=images[1:])
+    with Image.open(buffer) as gif:
+        frames = []
+        for i in range(gif.n_frames):
+            gif.seek(i)
+            frames.append(gif.copy())
+    return frames
+
+
+@pytest.mark.parametrize("a, b", [
+    ("cat", "cot"),
+    ("I will go there.", "I will go there,"),
+])
+def test_frame_hash_separates_one_character_edits(a: str, b: str):
+    assert frame_hash(make_frame(a)) != frame_hash(make_frame(b))
+
+
+def test_frame_hash_separates_player_names():
+    assert frame_hash(make_frame("cat", "Alice")) \
+        != frame_hash(make_frame("cat", "Alica"))
+
+
+def test_frame_hash_matches_same_frame_after_decoding():
+    # (the third frame is encoded as a difference from the second)
+    frames = gif_round_trip([
+        make_frame("cat"), make_frame("cot"), make_frame("cat")
+    ])
+    assert frame_hash(frames[0]) == frame_hash(frames[2])
+    assert frame_hash(frames[0]) == frame_hash(gif_round_trip([
+        make_frame("cat")
+    ])[0])
+
+
+class FakeBackend(OCRBackend):
+    # labels each frame sent with the call it was sent in
+    name = "fake"
+
+    def __init__(self) -> None:
+        self.sent: List[int] = []
+
+    def annotate_images(
+        self, images: Iterable[Image.Image]
+    ) -> List[ImageAnnotation]:
+        images = list(images)
+        self.sent.append(len(images))
+        return [
+            ImageAnnotation(f"call{len(self.sent)}-{i}", "")
+            for i in range(len(images))
+        ]
+
+
+@pytest.fixture
+def frame_db(monkeypatch):
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    models.FrameOcrResult.__table__.create(engine)
+    monkeypatch.setattr(
+        frame_ocr_cache_module, "SessionLocal", sessionmaker(bind=engine)
+    )
+    monkeypatch.setattr(frame_ocr_cache_module, "insert", sqlite.insert)
+    return engine
+
+
+def test_one_character_edit_misses_cache(frame_db):
+    backend = FakeBackend()
+    cache = FrameOcrCache(16)
+
+    first = cache.annotate(
+        [make_frame("I will go there."), make_frame("I will go there.")],
+        backend
+    )[0]
+    assert backend.sent == [1]
+    assert [a.description for a in first] == ["call1-0", "call1-0"]
+
+    second = cache.annotate(
+        [make_frame("I will go there."), make_frame("I will go there,")],
+        backend
+    )[0]
+    assert backend.sent == [1, 1]
+    assert [a.description for a in second] == ["call1-0", "call2-0"]
+
+    # the same holds for results read from the database
+    third = FrameOcrCache(16).annotate(
+        [make_frame("cot"), make_frame("I will go there,")],
+        backend
+    )[0]
+    assert backend.sent == [1, 1, 1]
+    assert [a.description for a in third] == ["call3-0", "call2-0"]
+
+
+def test_annotate_decodes_missed_frames_again(frame_db, tmp_path):
+    path = str(tmp_path / "album.gif")
+    texts = ["cat", "cot", "cat", "dog", "cot"]
+    images = [make_frame(text) for text in texts]
+    images[0].save(path, save_all=True, append_images=images[1:])
+    gif = GifManager(path)
+
+    cache = FrameOcrCache(16)
+    cache.annotate([make_frame("dog")], FakeBackend())
+
+    sent_hashes: List[str] = []
+
+    class HashingBackend(OCRBackend):
+        name = "fake"
+
+        def annotate_images(self, images: Iterable[Image.Image]):
+            result = []
+            for image in images:
+                sent_hashes.append(frame_hash(image))
+                result.append(ImageAnnotation(f"sent{len(result)}", ""))
+            return result
+
+    result, _ = cache.annotate(gif, HashingBackend())
+    assert sent_hashes == [
+        frame_hash(make_frame("cat")), frame_hash(make_frame("cot"))
+    ]
+    assert [a.description for a in result] == \
+        ["sent0", "sent1", "sent0", "call1-0", "sent1"]
+
+    with pytest.raises(TypeError):
+        cache.annotate(gif.iter_frames(), HashingBackend())
+
+
+class HangingBackend(OCRBackend):
+    name = "hanging"
+
+    def __init__(self) -> None:
+        self.release = threading.Event()
+
+    def annotate_images(
+        self, images: Iterable[Image.Image]
+    ) -> List[ImageAnnotation]:
+        self.release.wait()
+        return [ImageAnnotation("late", "") for _ in images]
+
+
+def test_fallback_results_are_cached_under_fallback_name(frame_db):
+    primary = HangingBackend()
+    fallback = FakeBackend()
+    backend = FallbackBackend(primary, fallback, 0.01)
+    cache = FrameOcrCache(16)
+    try:
+        result, answered_by = cache.annotate([make_frame("cat")], backend)
+        assert answered_by is fallback
+        assert [a.description for a in result] == ["call1-0"]
+
+        # not taken as results of the primary backend
+        assert cache.get_many([f"hanging:{frame_hash(make_frame('cat'))}"]) \
+            == {}
+        assert f"fake:{frame_hash(make_frame('cat'))}" in cache.entries
+    finally:
+        primary.release.set()
+
+
+def test_fallback_primary_calls_are_bounded(frame_db, monkeypatch):
+    monkeypatch.setattr(ocr_backends_module, "FALLBACK_MAX_PRIMARY_CALLS", 2)
+    primary = HangingBackend()
+    calls: List[int] = []
+    original = primary.annotate_images_by
+
+    def annotate_images_by(images):
+        calls.append(1)
+        return original(images)
+    primary.annotate_images_by = annotate_images_by
+
+    backend = FallbackBackend(primary, StubBackend(0), 0.01)
+    try:
+        for _ in range(5):
+            _, answered_by = backend.annotate_images_by([make_frame("cat")])
+            assert answered_by.name == "stub"
+        # calls that timed out waiting for a thread are dropped
+        assert len(calls) == 2
+    finally:
+        primary.release.set()
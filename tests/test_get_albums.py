@@ -0,0 +1,195 @@
+import base64
+import datetime
+import json
+from typing import List
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from auth.auth import CurrentUser, get_current_user
+from routers import albums
+from sql_interface import crud, models
+from sql_interface.count_cache import albums_count_cache
+from sql_interface.database import Base, get_async_db
+
+
+def populate(db: Session) -> None:
+    # 30 albums with 2 pages each; user bookmarks every third album
+    user = models.User(id="user", password="", display_name="user")
+    db.add(user)
+    db.add(models.Gamemode(id=1, name="gamemode"))
+    db.flush()
+    for i in range(30):
+        album = models.Album(
+            source=f"album{i}.gif",
+            gamemode_id=1,
+            played_at=datetime.datetime(2023, 1, 1)
+                + datetime.timedelta(hours=i),
+            page_count=2,
+            pv_count=i % 4,
+            download_count=i % 5,
+        )
+        db.add(album)
+        db.flush()
+        for j in range(2):
+            db.add(models.Page(
+                album_id=album.id,
+                index=j,
+                description=f"page {j} of album {i}",
+                player_name=f"player{i % 3}",
+            ))
+        if i % 3 == 0:
+            user.bookmark_albums.append(album)
+    db.commit()
+
+
+@pytest.fixture
+def db():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    Base.metadata.create_all(engine)
+    albums_count_cache.invalidate()
+    with Session(engine) as db:
+        populate(db)
+        yield db
+    albums_count_cache.invalidate()
+
+
+def get_albums(
+    db: Session, limit: int = 10, albums_version: int = 1, **filters
+) -> crud.GetAlbums:
+    filters = {
+        "partial_desc": None, "partial_pname": None, "played_from": None,
+        "played_until": None, "gamemode_id": None, "partial_tag": None,
+        **filters
+    }
+    return crud.get_albums(
+        db, crud.GET_ALBUMS_ORDER_BY_PAT, crud.GET_ALBUMS_ORDER_DESC,
+        0, limit, my_bookmark=False, user_id="user",
+        albums_version=albums_version, **filters
+    )
+
+
+@pytest.mark.parametrize("order_by", [
+    crud.GET_ALBUMS_ORDER_BY_PAT,
+    crud.GET_ALBUMS_ORDER_BY_PVC,
+    crud.GET_ALBUMS_ORDER_BY_DLC,
+])
+@pytest.mark.parametrize("order", [
+    crud.GET_ALBUMS_ORDER_ASC, crud.GET_ALBUMS_ORDER_DESC
+])
+def test_cursor_visits_every_album_once(db, order_by: int, order: int):
+    # (sort values tie across many albums)
+    visited: List[int] = []
+    cursor = None
+    while True:
+        result = crud.get_albums(
+            db, order_by, order, 0, 7, None, None, None, None, None, None,
+            False, "user", cursor
+        )
+        visited.extend(row.album.id for row in result.albums)
+        if result.next_cursor is None:
+            break
+        cursor = result.next_cursor
+    assert sorted(visited) == list(range(1, 31))
+
+
+def test_albums_cursor_requires_played_at():
+    cursor = crud.GetAlbumsCursor(3, datetime.datetime(2023, 1, 1), 10)
+    encoded = albums.encode_albums_cursor("pvCount", "desc", cursor)
+    assert albums.decode_albums_cursor(encoded, "pvCount", "desc") == cursor
+
+    payload = json.loads(base64.urlsafe_b64decode(encoded))
+    payload["playedAt"] = None
+    with pytest.raises(ValueError):
+        albums.decode_albums_cursor(
+            base64.urlsafe_b64encode(
+                json.dumps(payload).encode()
+            ).decode(),
+            "pvCount", "desc"
+        )
+
+
+def test_short_pattern_count_is_bounded(db, monkeypatch):
+    monkeypatch.setattr(crud, "SHORT_PATTERN_COUNT_LIMIT", 20)
+
+    result = get_albums(db, partial_desc="of")
+    assert (result.albums_count, result.albums_count_exact) == (20, False)
+    assert len(result.albums) == 10
+
+    # the same from the count cache
+    result = get_albums(db, partial_desc="of")
+    assert (result.albums_count, result.albums_count_exact) == (20, False)
+
+    # under the limit, short patterns are counted exactly
+    result = get_albums(db, partial_pname="r0")
+    assert (result.albums_count, result.albums_count_exact) == (10, True)
+
+    # longer patterns are not bounded
+    result = get_albums(db, partial_desc="album")
+    assert (result.albums_count, result.albums_count_exact) == (30, True)
+
+
+def test_count_cache_is_keyed_by_albums_version(db):
+    assert get_albums(db).albums_count == 30
+
+    # album added by another process: the cache of this one is not
+    # invalidated, but the albums version is bumped
+    db.add(models.Album(
+        source="other.gif", played_at=datetime.datetime(2024, 1, 1)
+    ))
+    db.commit()
+    assert get_albums(db).albums_count == 30
+    assert get_albums(db, albums_version=2).albums_count == 31
+
+    # counts are not cached without a version
+    assert get_albums(db, albums_version=None).albums_count == 31
+
+
+def test_read_albums_query_count_does_not_grow_with_limit(tmp_path):
+    # statements issued by GET /albums, including serializing the rows
+    db_path = tmp_path / "albums.db"
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        populate(db)
+    engine.dispose()
+
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+    statements: List[str] = []
+
+    @event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+    def count_statement(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    async def get_test_async_db():
+        async with AsyncSession(async_engine) as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(albums.router)
+    app.dependency_overrides[get_async_db] = get_test_async_db
+    app.dependency_overrides[get_current_user] = lambda: CurrentUser(
+        "user", "user", datetime.datetime.now(), datetime.datetime.now()
+    )
+    client = TestClient(app)
+
+    for params in ({}, {"orderBy": "pvCount"}, {"myBookmark": "1"}):
+        counts = []
+        for limit in (1, 5, 10):
+            albums_count_cache.invalidate()
+            statements.clear()
+            response = client.get("/albums", params={**params, "limit": limit})
+            assert response.status_code == 200
+            assert len(response.json()["albums"]) == limit
+            counts.append(len(statements))
+        assert counts[0] == counts[1] == counts[2], params
+    albums_count_cache.invalidate()
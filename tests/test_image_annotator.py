@@ -0,0 +1,85 @@
+import os
+from typing import List
+
+import pytest
+from google.cloud.vision_v1.types import BatchAnnotateImagesResponse
+from PIL import Image
+
+from ocr.image_annotator import (
+    REGION_PLAYER, REGION_SUBT, ImageAnnotation, annotate_images,
+    build_mosaics, collect_annotations
+)
+
+
+# Vision responses for the two mosaics of three 720x540 frames, in the
+# JSON format of BatchAnnotateImagesResponse; besides the words of each
+# tile, the subtitle mosaic has a word in the gap between the first two
+# tiles and a word crossing the bottom of the first tile, and the player
+# mosaic has a word in the gap as well
+RESPONSES_PATH = os.path.join(
+    os.path.dirname(__file__), "fixtures", "vision_mosaic_responses.json"
+)
+
+EXPECTED_ANNOTATIONS = [
+    ImageAnnotation("勇者よ、目覚めなさい", "Alice"),
+    ImageAnnotation("ここは宿屋です", "Bob"),
+    ImageAnnotation("", "Alice"),
+]
+
+
+@pytest.fixture
+def responses() -> BatchAnnotateImagesResponse:
+    with open(RESPONSES_PATH, encoding="utf-8") as f:
+        return BatchAnnotateImagesResponse.from_json(f.read())
+
+
+def make_frames() -> List[Image.Image]:
+    return [Image.new("RGB", (720, 540)) for _ in range(3)]
+
+
+def test_mosaic_layout():
+    # the layout the word boxes in the fixture refer to
+    mosaics, n_frames = build_mosaics(make_frames())
+    assert n_frames == 3
+    assert [
+        [(tile.frame_index, tile.region, tile.box) for tile in mosaic.tiles]
+        for mosaic in mosaics
+    ] == [
+        [
+            (0, REGION_SUBT, (0, 0, 578, 250)),
+            (1, REGION_SUBT, (0, 274, 578, 524)),
+            (2, REGION_SUBT, (0, 548, 578, 798)),
+        ],
+        [
+            (0, REGION_PLAYER, (0, 0, 606, 35)),
+            (1, REGION_PLAYER, (0, 59, 606, 94)),
+            (2, REGION_PLAYER, (0, 118, 606, 153)),
+        ],
+    ]
+
+
+def test_collect_annotations_maps_words_to_frames_and_regions(responses):
+    # words outside every tile (in gaps or across tile edges) are dropped,
+    # as words outside the regions of whole frames were
+    mosaics, n_frames = build_mosaics(make_frames())
+    assert collect_annotations(mosaics, responses.responses, n_frames) \
+        == EXPECTED_ANNOTATIONS
+
+
+class FixtureClient:
+    def __init__(self, responses: BatchAnnotateImagesResponse) -> None:
+        self.responses = responses
+        self.requests: List[dict] = []
+
+    def batch_annotate_images(
+        self, requests: List[dict]
+    ) -> BatchAnnotateImagesResponse:
+        self.requests.extend(requests)
+        return self.responses
+
+
+def test_annotate_images_with_fixture_responses(responses):
+    client = FixtureClient(responses)
+    assert annotate_images(make_frames(), client=client) \
+        == EXPECTED_ANNOTATIONS
+    assert len(client.requests) == 2
@@ -0,0 +1,102 @@
+import asyncio
+import os
+from typing import AsyncIterator, List
+
+import pytest
+from starlette.requests import ClientDisconnect, Request
+
+from routers import albums
+from routers.multipart_stream import iter_first_file
+
+
+BOUNDARY = "----boundary1234"
+CONTENT_TYPE = f"multipart/form-data; boundary={BOUNDARY}"
+
+
+def make_body(parts: List[tuple]) -> bytes:
+    # parts are (name, filename or None, data)
+    body = b""
+    for name, filename, data in parts:
+        disposition = f'form-data; name="{name}"'
+        if filename is not None:
+            disposition += f'; filename="{filename}"'
+        body += f"--{BOUNDARY}\r\n".encode() \
+            + f"Content-Disposition: {disposition}\r\n".encode() \
+            + b"Content-Type: application/octet-stream\r\n\r\n" \
+            + data + b"\r\n"
+    return body + f"--{BOUNDARY}--\r\n".encode()
+
+
+class ChunkedBody:
+    def __init__(self, body: bytes, chunk_size: int) -> None:
+        self.body = body
+        self.chunk_size = chunk_size
+        self.read_bytes = 0
+
+    async def stream(self) -> AsyncIterator[bytes]:
+        for i in range(0, len(self.body), self.chunk_size):
+            chunk = self.body[i:i + self.chunk_size]
+            self.read_bytes += len(chunk)
+            yield chunk
+
+
+def read_first_file(content_type: str, body: ChunkedBody) -> bytes:
+    async def read() -> bytes:
+        return b"".join([
+            chunk async for chunk in iter_first_file(
+                content_type, body.stream()
+            )
+        ])
+    return asyncio.run(read())
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 4096, 1 << 20])
+def test_reads_first_file_only(chunk_size: int):
+    data = os.urandom(100_000) + f"\r\n--{BOUNDARY}".encode()[:-1]
+    body = ChunkedBody(make_body([
+        ("comment", None, b"hello"),
+        ("file", "album.gif", data),
+        ("other", "other.gif", os.urandom(300_000)),
+    ]), chunk_size)
+    assert read_first_file(CONTENT_TYPE, body) == data
+    # reading stops at the chunk with the boundary after the file
+    end = body.body.index(data) + len(data) + len(f"\r\n--{BOUNDARY}\r\n")
+    assert body.read_bytes < end + chunk_size
+
+
+def test_yields_nothing_without_files():
+    body = ChunkedBody(make_body([("comment", None, b"hello")]), 16)
+    assert read_first_file(CONTENT_TYPE, body) == b""
+
+
+def test_rejects_malformed_bodies():
+    body = ChunkedBody(make_body([("file", "album.gif", b"GIF89a")]), 16)
+    with pytest.raises(ValueError):
+        read_first_file("multipart/form-data", body)
+
+    truncated = ChunkedBody(make_body([
+        ("file", "album.gif", os.urandom(1000))
+    ])[:500], 16)
+    with pytest.raises(ValueError):
+        read_first_file(CONTENT_TYPE, truncated)
+
+
+def test_upload_removes_partial_file_on_disconnect(tmp_path, monkeypatch):
+    monkeypatch.setattr(albums, "TEMP_DIR_NAME", str(tmp_path))
+    messages = [
+        {"type": "http.request", "body": b"GIF89a", "more_body": True},
+        {"type": "http.disconnect"},
+    ]
+
+    async def receive() -> dict:
+        return messages.pop(0)
+
+    request = Request({
+        "type": "http",
+        "method": "POST",
+        "path": "/albums/temp/upload",
+        "headers": [(b"content-type", b"image/gif")],
+    }, receive)
+    with pytest.raises(ClientDisconnect):
+        asyncio.run(albums.upload_temp_album(None, request, None))
+    assert os.listdir(tmp_path) == []
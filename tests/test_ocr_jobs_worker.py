@@ -0,0 +1,152 @@
+import datetime
+import threading
+import time
+from typing import Iterable, List, Union
+
+import pytest
+from PIL import Image
+from sqlalchemy import create_engine
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from ocr.backends import FallbackBackend, OCRBackend, StubBackend
+from ocr.image_annotator import ImageAnnotation
+from routers import ocr_jobs_worker as ocr_jobs_worker_module
+from routers.ocr_jobs_worker import OcrJobsWorker
+from sql_interface import crud, models
+from sql_interface import frame_ocr_cache as frame_ocr_cache_module
+from sql_interface.database import Base
+
+
+LONG_AGO = datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+@pytest.fixture
+def session_local(monkeypatch):
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    Base.metadata.create_all(engine)
+    session_local = sessionmaker(bind=engine)
+    monkeypatch.setattr(ocr_jobs_worker_module, "SessionLocal", session_local)
+    monkeypatch.setattr(frame_ocr_cache_module, "SessionLocal", session_local)
+    monkeypatch.setattr(frame_ocr_cache_module, "insert", sqlite.insert)
+    return session_local
+
+
+def add_ocr_job(
+    db: Session, uuid: str, status: str, hash: Union[str, None] = None
+) -> int:
+    db.add(models.TempAlbum(uuid=uuid, page_count=2, hash=hash))
+    db_ocr_job = models.OcrJob(
+        temp_album_uuid=uuid, status=status, attempts=1,
+        created_at=LONG_AGO, updated_at=LONG_AGO
+    )
+    db.add(db_ocr_job)
+    db.commit()
+    return db_ocr_job.id
+
+
+def updated_at(db: Session, id: int) -> datetime.datetime:
+    db.expire_all()
+    updated_at = db.get(models.OcrJob, id).updated_at
+    return updated_at.replace(tzinfo=datetime.timezone.utc)
+
+
+def test_worker_starts_no_process_until_started():
+    assert OcrJobsWorker().procs == []
+
+
+def test_heartbeat_touches_running_job(session_local, monkeypatch):
+    monkeypatch.setattr(ocr_jobs_worker_module, "OCR_JOB_HEARTBEAT_SECS", 0.01)
+    with session_local() as db:
+        running_id = add_ocr_job(db, "running", models.OCR_JOB_STATUS_RUNNING)
+        queued_id = add_ocr_job(db, "queued", models.OCR_JOB_STATUS_QUEUED)
+
+        worker = OcrJobsWorker()
+        stop_events = [threading.Event(), threading.Event()]
+        threads = [
+            threading.Thread(target=worker.heartbeat, args=(id, stop_event))
+            for id, stop_event in zip((running_id, queued_id), stop_events)
+        ]
+        for thread in threads:
+            thread.start()
+        deadline = time.monotonic() + 5
+        while updated_at(db, running_id) == LONG_AGO \
+                and time.monotonic() < deadline:
+            time.sleep(0.01)
+        for stop_event in stop_events:
+            stop_event.set()
+        for thread in threads:
+            thread.join()
+
+        assert updated_at(db, running_id) > LONG_AGO
+        # jobs no longer running are left alone
+        assert updated_at(db, queued_id) == LONG_AGO
+
+
+class FakeBackend(OCRBackend):
+    name = "fake"
+
+    def annotate_images(
+        self, images: Iterable[Image.Image]
+    ) -> List[ImageAnnotation]:
+        return [ImageAnnotation(f"frame{i}", "") for i, _ in enumerate(images)]
+
+
+@pytest.fixture
+def gif_path(tmp_path, monkeypatch):
+    path = str(tmp_path / "album.gif")
+    images = [Image.new("RGB", (720, 540), (i, i, i)) for i in (0, 255)]
+    images[0].save(path, save_all=True, append_images=images[1:])
+    monkeypatch.setattr(ocr_jobs_worker_module, "get_gif_path", lambda _: path)
+    return path
+
+
+def test_ocr_results_are_kept_per_backend(session_local, gif_path):
+    with session_local() as db:
+        add_ocr_job(db, "album", models.OCR_JOB_STATUS_QUEUED, "hash")
+        assert OcrJobsWorker().process_ocr_job(FakeBackend())
+
+        assert crud.get_cached_ocr_result(db, "hash", "fake") == [
+            {"description": "frame0", "playerName": ""},
+            {"description": "frame1", "playerName": ""},
+        ]
+        assert crud.get_cached_ocr_result(db, "hash", "vision") is None
+
+
+def test_stub_results_are_not_kept(session_local, gif_path):
+    with session_local() as db:
+        add_ocr_job(db, "album", models.OCR_JOB_STATUS_QUEUED, "hash")
+        assert OcrJobsWorker().process_ocr_job(StubBackend(0))
+
+        assert db.query(models.OcrJob).one().status \
+            == models.OCR_JOB_STATUS_DONE
+        assert db.query(models.OcrResult).count() == 0
+        assert db.query(models.FrameOcrResult).count() == 0
+
+
+class FailingBackend(OCRBackend):
+    name = "vision"
+
+    def annotate_images(
+        self, images: Iterable[Image.Image]
+    ) -> List[ImageAnnotation]:
+        raise RuntimeError("unavailable")
+
+
+def test_fallback_results_are_not_kept_for_primary(session_local, gif_path):
+    with session_local() as db:
+        add_ocr_job(db, "album", models.OCR_JOB_STATUS_QUEUED, "hash")
+        backend = FallbackBackend(FailingBackend(), FakeBackend(), 1)
+        assert OcrJobsWorker().process_ocr_job(backend)
+
+        assert db.query(models.OcrJob).one().page_meta_data[0] \
+            == {"description": "frame0", "playerName": ""}
+        assert crud.get_cached_ocr_result(db, "hash", "vision") is None
+        keys = [key for key, in db.query(models.FrameOcrResult.key)]
+        assert len(keys) == 2
+        assert all(key.startswith("fake:") for key in keys)
@@ -0,0 +1,43 @@
+import pytest
+from botocore.stub import Stubber
+
+from storage import s3
+from storage.s3 import S3StorageBackend
+
+
+@pytest.fixture
+def stubbed_client(monkeypatch):
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "ap-northeast-1")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "fake")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "fake")
+    monkeypatch.setenv("AWS_S3_BUCKET_NAME", "bucket")
+    monkeypatch.setattr(s3, "s3_client", None)
+    with Stubber(s3.get_client()) as stubber:
+        yield stubber
+
+
+@pytest.mark.parametrize("status_code, code", [
+    (404, "404"),
+    # HeadObject without s3:ListBucket
+    (403, "403"),
+])
+def test_exists_is_false_for_missing_keys(stubbed_client, status_code, code):
+    stubbed_client.add_client_error(
+        "head_object", service_error_code=code, http_status_code=status_code
+    )
+    assert not S3StorageBackend().exists("albums/v2/missing.gif")
+
+
+def test_exists_raises_other_errors(stubbed_client):
+    stubbed_client.add_client_error(
+        "head_object", service_error_code="500", http_status_code=500
+    )
+    with pytest.raises(s3.ClientError):
+        S3StorageBackend().exists("albums/v2/key.gif")
+
+
+def test_exists_is_true_for_stored_keys(stubbed_client):
+    stubbed_client.add_response(
+        "head_object", {}, {"Bucket": "bucket", "Key": "albums/v2/key.gif"}
+    )
+    assert S3StorageBackend().exists("albums/v2/key.gif")